@@ -1,7 +1,6 @@
 import os
+import secrets
 from pathlib import Path
-import hashlib
-import time
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -10,12 +9,15 @@ load_dotenv(BASE_DIR / ".env")
 DATA_DIR = BASE_DIR / "data"
 UPLOAD_DIR = BASE_DIR / "static" / "uploads"
 DB_PATH = DATA_DIR / "presence.db"
+TEMPLATE_CACHE_DIR = DATA_DIR / "template_cache"
 
 DATA_DIR.mkdir(exist_ok=True)
+TEMPLATE_CACHE_DIR.mkdir(exist_ok=True)
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 SCAN_INTERVAL = 0.3
-DEBOUNCE_SECONDS = 3
+# Repeat reads of the same tag within this window are ignored.
+DEBOUNCE_SECONDS = int(os.environ.get("RFID_DEBOUNCE_MS", 3000)) / 1000
 
 WEB_HOST = "0.0.0.0"
 WEB_PORT = 5000
@@ -27,15 +29,19 @@ if not SECRET_KEY or not ADMIN_PASSWORD:
     raise ValueError("SECRET_KEY and ADMIN_PASSWORD must be set in .env file")
 
 MAX_CONTENT_LENGTH = 5 * 1024 * 1024
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+# Set when a front-end server (Apache mod_xsendfile, lighttpd) delivers files
+# named in an X-Sendfile header, so static files and photos skip Python.
+USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE") == "1"
+# nginx's equivalent: the URI prefix of an `internal` location aliased to
+# static/. Files are then handed off with X-Accel-Redirect.
+X_ACCEL_PREFIX = os.environ.get("X_ACCEL_PREFIX", "").rstrip("/")
+ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'webp'})
 
 AUTO_CHECKOUT_HOURS = 5
 
 
 def generate_uuid() -> str:
-    seed = f"{time.time_ns()}-{id(object())}-{os.getpid()}"
-    hash_hex = hashlib.sha256(seed.encode()).hexdigest()
-    return hash_hex[:12]
+    return secrets.token_hex(6)
 
 
 # RC522 GPIO pin reference (directly connected to Raspberry Pi)
@@ -1,25 +1,117 @@
+import atexit
+import hmac
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import time
+import weakref
 from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
 from hashlib import sha256
 from app.config import DB_PATH, AUTO_CHECKOUT_HOURS
 
+_local = threading.local()
+
+
+class _Connection(sqlite3.Connection):
+    # Subclassed only so connections can live in a WeakSet.
+    pass
+
+
+_connections = weakref.WeakSet()
+
+
+def _connect() -> sqlite3.Connection:
+    # check_same_thread is off so _close_all can close every thread's
+    # connection at exit; during normal use each stays on its own thread.
+    conn = sqlite3.connect(DB_PATH, cached_statements=512, check_same_thread=False, factory=_Connection)
+    _connections.add(conn)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-16000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
 
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA synchronous=FULL")
+    # One connection per thread, opened lazily and reused across calls.
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _connect()
     try:
         yield conn
     finally:
+        # The connection outlives this block, so never hand an open
+        # transaction to the next caller on this thread.
+        if conn.in_transaction:
+            conn.rollback()
+
+
+@contextmanager
+def transaction():
+    # Take the write lock up front so a read-then-write sequence cannot be
+    # interleaved with another writer; get_db rolls back if the block raises.
+    with get_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.commit()
+
+
+def close_db():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        _local.conn = None
+        conn.close()
+
+
+def _close_all():
+    for conn in list(_connections):
         conn.close()
 
 
+atexit.register(_close_all)
+
+
+def _fetch_dicts(cursor) -> list[dict]:
+    # Build dicts straight from plain tuples instead of going through
+    # sqlite3.Row; the cursor must have row_factory = None.
+    keys = [d[0] for d in cursor.description]
+    return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+
+# Child tables follow members(id) on rename and delete. Their timestamps are
+# unix seconds.
+PRESENCE_TABLE = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        member_id TEXT PRIMARY KEY,
+        is_present BOOLEAN DEFAULT 0,
+        last_scan INTEGER,
+        checked_in_at INTEGER,
+        FOREIGN KEY (member_id) REFERENCES members(id) ON UPDATE CASCADE ON DELETE CASCADE
+    )
+"""
+
+SCAN_LOG_TABLE = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        member_id TEXT,
+        action TEXT,
+        scanned_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        FOREIGN KEY (member_id) REFERENCES members(id) ON UPDATE CASCADE ON DELETE CASCADE
+    )
+"""
+
+
 def init_db():
     with get_db() as conn:
         cursor = conn.cursor()
+        # WAL is stored in the database file, so it only needs setting once.
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # Schema, migrations and repair commit together in one transaction.
+        cursor.execute("BEGIN IMMEDIATE")
 
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS members (
@@ -33,59 +125,193 @@ def init_db():
             )
         """)
 
+        cursor.execute(PRESENCE_TABLE.format(name="presence"))
+        cursor.execute(SCAN_LOG_TABLE.format(name="scan_log"))
+
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS presence (
-                member_id TEXT PRIMARY KEY,
-                is_present BOOLEAN DEFAULT 0,
-                last_scan TIMESTAMP,
-                checked_in_at TIMESTAMP,
-                FOREIGN KEY (member_id) REFERENCES members(id)
+            CREATE TABLE IF NOT EXISTS pending_tags (
+                id TEXT PRIMARY KEY,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
 
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS scan_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                member_id TEXT,
-                action TEXT,
-                scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (member_id) REFERENCES members(id)
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
             )
         """)
 
+        migrate_db(conn)
+
+        cursor.execute("DROP INDEX IF EXISTS idx_presence_present_checkin")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_presence_active
+            ON presence(checked_in_at DESC, member_id) WHERE is_present = 1
+        """)
+
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS pending_tags (
-                id TEXT PRIMARY KEY,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            CREATE INDEX IF NOT EXISTS idx_scan_log_member
+            ON scan_log(member_id)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_members_passkey
+            ON members(passkey) WHERE passkey IS NOT NULL
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_members_username
+            ON members(username) WHERE username IS NOT NULL
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_members_total
+            ON members(total_seconds DESC) WHERE total_seconds > 0
+        """)
+
+        # Covering indexes: the leaderboard's per-boat totals and the
+        # name-ordered member list read these without touching the table
+        # or sorting in a temp b-tree.
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_members_boat_total
+            ON members(boat_class, total_seconds)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_members_name_cover
+            ON members(name, id, profile_picture, rowing_category)
+        """)
+
+        # Every presence flip is logged by SQLite itself, in the same
+        # statement that performs it.
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_presence_log
+            AFTER UPDATE OF is_present ON presence
+            WHEN OLD.is_present IS NOT NEW.is_present
+            BEGIN
+                INSERT INTO scan_log (member_id, action)
+                VALUES (NEW.member_id, CASE WHEN NEW.is_present THEN 'in' ELSE 'out' END);
+            END
         """)
 
-        migrate_db(conn)
         repair_presence(conn)
+        load_table_columns(conn)
+        # Refresh planner statistics so the partial presence index is costed
+        # against the current table sizes.
+        cursor.execute("ANALYZE")
         conn.commit()
         print(f"Database initialized at {DB_PATH}")
 
 
+SCHEMA_VERSION = 3
+
+
 def migrate_db(conn):
+    # Each step runs once; PRAGMA user_version records the last one applied
+    # and is committed together with the rest of init_db's transaction.
     cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    version = cursor.fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    if version < 1:
+        cursor.execute("PRAGMA table_info(members)")
+        columns = [col[1] for col in cursor.fetchall()]
+
+        if 'boat_class' not in columns:
+            cursor.execute("ALTER TABLE members ADD COLUMN boat_class TEXT DEFAULT NULL")
+
+        if 'total_seconds' not in columns:
+            cursor.execute("ALTER TABLE members ADD COLUMN total_seconds INTEGER DEFAULT 0")
+
+        if 'passkey' not in columns:
+            cursor.execute("ALTER TABLE members ADD COLUMN passkey TEXT DEFAULT NULL")
+
+        if 'username' not in columns:
+            cursor.execute("ALTER TABLE members ADD COLUMN username TEXT DEFAULT NULL")
+
+        if 'password_hash' not in columns:
+            cursor.execute("ALTER TABLE members ADD COLUMN password_hash TEXT DEFAULT NULL")
+
+    if version < 2:
+        for table, schema in (("presence", PRESENCE_TABLE), ("scan_log", SCAN_LOG_TABLE)):
+            cursor.execute(f"PRAGMA foreign_key_list({table})")
+            if all(fk["on_update"] == "CASCADE" for fk in cursor.fetchall()):
+                continue
+            # SQLite cannot alter a foreign key in place, so rebuild the table.
+            # Rows pointing at members that no longer exist are dropped.
+            cursor.execute(f"PRAGMA table_info({table})")
+            cols = ", ".join(col[1] for col in cursor.fetchall())
+            cursor.execute(schema.format(name=f"{table}_new"))
+            cursor.execute(f"""
+                INSERT INTO {table}_new ({cols})
+                SELECT {cols} FROM {table}
+                WHERE member_id IS NULL OR member_id IN (SELECT id FROM members)
+            """)
+            cursor.execute(f"DROP TABLE {table}")
+            cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+            print(f"Migrated {table} to cascading foreign keys")
+
+    if version < 3:
+        # Timestamps used to be stored as text: presence in local time (the
+        # sqlite3 datetime adapter), scan_log in UTC (CURRENT_TIMESTAMP).
+        for column in ("last_scan", "checked_in_at"):
+            cursor.execute(f"""
+                UPDATE presence SET {column} = CAST(strftime('%s', {column}, 'utc') AS INTEGER)
+                WHERE typeof({column}) = 'text'
+            """)
+        cursor.execute("""
+            UPDATE scan_log SET scanned_at = CAST(strftime('%s', scanned_at) AS INTEGER)
+            WHERE typeof(scanned_at) = 'text'
+        """)
+
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+# Timestamps are stored as unix seconds but shown and served as the text
+# they used to be stored as: presence in local time, scan_log in UTC.
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-    cursor.execute("PRAGMA table_info(members)")
-    columns = [col[1] for col in cursor.fetchall()]
 
-    if 'boat_class' not in columns:
-        cursor.execute("ALTER TABLE members ADD COLUMN boat_class TEXT DEFAULT NULL")
+@lru_cache(maxsize=1024)
+def _local_time_text(ts: int) -> str:
+    return time.strftime(TIMESTAMP_FORMAT, time.localtime(ts))
 
-    if 'total_seconds' not in columns:
-        cursor.execute("ALTER TABLE members ADD COLUMN total_seconds INTEGER DEFAULT 0")
 
-    if 'passkey' not in columns:
-        cursor.execute("ALTER TABLE members ADD COLUMN passkey TEXT DEFAULT NULL")
+def _utc_time_text(ts: int) -> str:
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(ts))
 
-    if 'username' not in columns:
-        cursor.execute("ALTER TABLE members ADD COLUMN username TEXT DEFAULT NULL")
 
-    if 'password_hash' not in columns:
-        cursor.execute("ALTER TABLE members ADD COLUMN password_hash TEXT DEFAULT NULL")
+def _parse_local_time(text: str) -> int:
+    return int(datetime.fromisoformat(text).timestamp())
+
+
+def _parse_utc_time(text: str) -> int:
+    return int(datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp())
+
+
+# table -> {column: (to_text, from_text)} for the admin table editor.
+TIMESTAMP_COLUMNS = {
+    'presence': {
+        'last_scan': (_local_time_text, _parse_local_time),
+        'checked_in_at': (_local_time_text, _parse_local_time),
+    },
+    'scan_log': {
+        'scanned_at': (_utc_time_text, _parse_utc_time),
+    },
+}
+
+
+TABLE_COLUMNS = {}
+
+
+def load_table_columns(conn):
+    cursor = conn.cursor()
+    for table in ('members', 'presence', 'pending_tags', 'settings'):
+        cursor.execute(f"PRAGMA table_info({table})")
+        TABLE_COLUMNS[table] = frozenset(col[1] for col in cursor.fetchall())
 
 
 def repair_presence(conn):
@@ -105,16 +331,28 @@ def hash_password(password: str) -> str:
 
 
 def check_password(password: str, password_hash: str) -> bool:
-    return sha256(password.encode()).hexdigest() == password_hash
+    # Bytes, because compare_digest rejects non-ASCII str and the stored hash
+    # can be edited freely in the admin table editor.
+    return hmac.compare_digest(sha256(password.encode()).hexdigest().encode(), password_hash.encode())
+
+
+# Member lookups run on every login and profile view. Each is one constant
+# string, so sqlite3's statement cache hands back the prepared statement.
+MEMBER_COLUMNS = "id, name, profile_picture, rowing_category, boat_class, total_seconds, passkey, username, password_hash"
+MEMBER_BY_ID_SQL = f"SELECT {MEMBER_COLUMNS} FROM members WHERE id = ?"
+MEMBER_BY_USERNAME_SQL = f"SELECT {MEMBER_COLUMNS} FROM members WHERE username = ?"
+MEMBER_BY_ID_OR_PASSKEY_SQL = f"""
+    SELECT {MEMBER_COLUMNS} FROM members WHERE id = ?
+    UNION ALL
+    SELECT {MEMBER_COLUMNS} FROM members WHERE passkey = ? AND id <> ?
+    LIMIT 1
+"""
 
 
 def get_member_by_username(username: str) -> dict | None:
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, name, profile_picture, rowing_category, boat_class, total_seconds, passkey, username, password_hash FROM members WHERE username = ?",
-            (username,)
-        )
+        cursor.execute(MEMBER_BY_USERNAME_SQL, (username,))
         row = cursor.fetchone()
         return dict(row) if row else None
 
@@ -136,8 +374,9 @@ def add_pending_tag(tag_id: str) -> bool:
 def get_pending_tags() -> list[dict]:
     with get_db() as conn:
         cursor = conn.cursor()
+        cursor.row_factory = None
         cursor.execute("SELECT id, created_at FROM pending_tags ORDER BY created_at DESC")
-        return [dict(row) for row in cursor.fetchall()]
+        return _fetch_dicts(cursor)
 
 
 def remove_pending_tag(tag_id: str) -> bool:
@@ -149,9 +388,9 @@ def remove_pending_tag(tag_id: str) -> bool:
 
 
 def create_member(member_id: str, name: str, rowing_category: str = None, boat_class: str = None) -> bool:
-    with get_db() as conn:
-        cursor = conn.cursor()
-        try:
+    try:
+        with transaction() as conn:
+            cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO members (id, name, rowing_category, boat_class) VALUES (?, ?, ?, ?)",
                 (member_id, name, rowing_category, boat_class)
@@ -161,10 +400,11 @@ def create_member(member_id: str, name: str, rowing_category: str = None, boat_c
                 (member_id,)
             )
             cursor.execute("DELETE FROM pending_tags WHERE id = ?", (member_id,))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
+        _forget_members(member_id)
+        _member_ids_changed()
+        return True
+    except sqlite3.IntegrityError:
+        return False
 
 
 _UNSET = object()
@@ -214,16 +454,17 @@ def update_member(member_id: str, name: str = None, profile_picture: str = None,
             params
         )
         conn.commit()
+        _forget_members(member_id)
         return cursor.rowcount > 0
 
 
 def delete_member(member_id: str) -> bool:
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM presence WHERE member_id = ?", (member_id,))
-        cursor.execute("DELETE FROM scan_log WHERE member_id = ?", (member_id,))
         cursor.execute("DELETE FROM members WHERE id = ?", (member_id,))
         conn.commit()
+        _forget_members(member_id)
+        _member_ids_changed()
         return cursor.rowcount > 0
 
 
@@ -231,169 +472,225 @@ def update_member_uuid(old_id: str, new_id: str) -> bool:
     with get_db() as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute("UPDATE scan_log SET member_id = ? WHERE member_id = ?", (new_id, old_id))
-            cursor.execute("UPDATE presence SET member_id = ? WHERE member_id = ?", (new_id, old_id))
             cursor.execute("UPDATE members SET id = ? WHERE id = ?", (new_id, old_id))
             conn.commit()
+            _forget_members(old_id, new_id)
+            _member_ids_changed()
             return cursor.rowcount > 0
         except sqlite3.IntegrityError:
             return False
 
 
 def toggle_presence(member_id: str) -> dict | None:
-    with get_db() as conn:
+    now = int(time.time())
+
+    # One write transaction per scan: credit the open session (if any) and
+    # flip presence, reading results back via RETURNING instead of a separate
+    # SELECT. trg_presence_log writes the scan_log row.
+    with transaction() as conn:
         cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT m.id, m.name, m.profile_picture, m.rowing_category, p.is_present, p.checked_in_at
-            FROM members m
-            JOIN presence p ON m.id = p.member_id
-            WHERE m.id = ?
-        """, (member_id,))
-
-        row = cursor.fetchone()
-        if not row:
-            return None
-
-        new_status = not row["is_present"]
-        action = "in" if new_status else "out"
-        now = datetime.now()
-
-        if new_status:
+            UPDATE members
+            SET total_seconds = total_seconds + COALESCE((
+                SELECT ? - p.checked_in_at
+                FROM presence p
+                WHERE p.member_id = members.id AND p.is_present = 1
+            ), 0)
+            WHERE id = ?
+            RETURNING id, name, profile_picture
+        """, (now, member_id))
+        member = cursor.fetchone()
+
+        if member:
             cursor.execute("""
                 UPDATE presence
-                SET is_present = ?, last_scan = ?, checked_in_at = ?
+                SET is_present = NOT is_present,
+                    last_scan = ?,
+                    checked_in_at = CASE WHEN is_present THEN NULL ELSE ? END
                 WHERE member_id = ?
-            """, (new_status, now, now, member_id))
+                RETURNING is_present
+            """, (now, now, member_id))
+            presence = cursor.fetchone()
         else:
-            if row["checked_in_at"]:
-                checked_in = datetime.fromisoformat(row["checked_in_at"])
-                session_seconds = int((now - checked_in).total_seconds())
-                cursor.execute("""
-                    UPDATE members
-                    SET total_seconds = total_seconds + ?
-                    WHERE id = ?
-                """, (session_seconds, member_id))
+            presence = None
 
-            cursor.execute("""
-                UPDATE presence
-                SET is_present = ?, last_scan = ?, checked_in_at = NULL
-                WHERE member_id = ?
-            """, (new_status, now, member_id))
+        if not presence:
+            conn.rollback()
+            return None
 
-        cursor.execute(
-            "INSERT INTO scan_log (member_id, action) VALUES (?, ?)",
-            (member_id, action)
-        )
+    # total_seconds may have changed.
+    _forget_members(member_id)
+    new_status = bool(presence["is_present"])
+    action = "in" if new_status else "out"
 
-        conn.commit()
+    return {
+        "id": member["id"],
+        "name": member["name"],
+        "profile_picture": member["profile_picture"],
+        "is_present": new_status,
+        "action": action
+    }
 
-        return {
-            "id": row["id"],
-            "name": row["name"],
-            "profile_picture": row["profile_picture"],
-            "is_present": new_status,
-            "action": action
-        }
+
+# (presence version, unix second) -> present list. Durations only change
+# each second, so every poll within that second shares one query.
+_present_cache: tuple[tuple | None, list[dict]] = (None, [])
 
 
 def get_present_members() -> list[dict]:
+    global _present_cache
+    now = int(time.time())
+    key = (_member_cache_gen, now)
+    cached_key, cached = _present_cache
+    if cached_key == key:
+        return [dict(m) for m in cached]
+
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT m.id, m.name, m.profile_picture, m.rowing_category, p.last_scan, p.checked_in_at
-            FROM members m
-            JOIN presence p ON m.id = p.member_id
+            SELECT m.id, m.name, m.profile_picture, m.rowing_category, p.last_scan, p.checked_in_at,
+                   ? - p.checked_in_at
+            FROM presence p INDEXED BY idx_presence_active
+            JOIN members m ON m.id = p.member_id
             WHERE p.is_present = 1
             ORDER BY p.checked_in_at DESC
-        """)
+        """, (now,))
 
         members = []
-        now = datetime.now()
-
-        for row in cursor.fetchall():
-            member = dict(row)
-
-            if member["checked_in_at"]:
-                checked_in = datetime.fromisoformat(member["checked_in_at"])
-                duration = now - checked_in
-                member["duration_seconds"] = duration.total_seconds()
-                member["duration_formatted"] = format_duration(duration)
+        for id_, name, picture, category, last_scan, checked_in_at, seconds in cursor.fetchall():
+            if seconds is None:
+                seconds = 0
+                formatted = "just arrived"
             else:
-                member["duration_seconds"] = 0
-                member["duration_formatted"] = "just arrived"
+                formatted = format_duration(seconds)
+            members.append({
+                "id": id_,
+                "name": name,
+                "profile_picture": picture,
+                "rowing_category": category,
+                "last_scan": _local_time_text(last_scan) if last_scan is not None else None,
+                "checked_in_at": _local_time_text(checked_in_at) if checked_in_at is not None else None,
+                "duration_seconds": seconds,
+                "duration_formatted": formatted,
+            })
 
-            members.append(member)
+    # Skip storing if a write invalidated presence while we were reading.
+    if key[0] == _member_cache_gen:
+        _present_cache = (key, members)
+    return [dict(m) for m in members]
 
-        return members
 
+PLURAL = ("", "s")
 
-def format_duration(duration: timedelta) -> str:
-    total_seconds = int(duration.total_seconds())
 
+def format_duration(total_seconds: int) -> str:
     if total_seconds < 60:
         return "less than a minute"
+    return _format_minutes(total_seconds // 60)
+
 
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
+@lru_cache(maxsize=512)
+def _format_minutes(total_minutes: int) -> str:
+    # Durations only change once a minute, so each string is built once.
+    hours, minutes = divmod(total_minutes, 60)
 
     if hours == 0:
-        return f"{minutes} minute{'s' if minutes != 1 else ''}"
+        return f"{minutes} minute{PLURAL[minutes != 1]}"
     elif minutes == 0:
-        return f"{hours} hour{'s' if hours != 1 else ''}"
+        return f"{hours} hour{PLURAL[hours != 1]}"
     else:
-        return f"{hours} hour{'s' if hours != 1 else ''}, {minutes} minute{'s' if minutes != 1 else ''}"
+        return f"{hours} hour{PLURAL[hours != 1]}, {minutes} minute{PLURAL[minutes != 1]}"
 
 
-def get_all_members() -> list[dict]:
+def iter_all_members():
+    # Rows are fetched in batches as the caller iterates; don't write to the
+    # database on this thread until the iterator is exhausted or closed.
     with get_db() as conn:
         cursor = conn.cursor()
+        cursor.row_factory = None
         cursor.execute("""
             SELECT m.id, m.name, m.profile_picture, m.rowing_category, p.is_present, p.last_scan, p.checked_in_at
             FROM members m
             JOIN presence p ON m.id = p.member_id
             ORDER BY m.name
         """)
-        return [dict(row) for row in cursor.fetchall()]
+        keys = [d[0] for d in cursor.description]
+        while batch := cursor.fetchmany(256):
+            for row in batch:
+                yield dict(zip(keys, row))
+
+
+def get_all_members() -> list[dict]:
+    return list(iter_all_members())
 
 
 def auto_checkout_stale():
-    cutoff = datetime.now() - timedelta(hours=AUTO_CHECKOUT_HOURS)
-    with get_db() as conn:
+    cutoff = int(time.time()) - AUTO_CHECKOUT_HOURS * 3600
+    with transaction() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT member_id, checked_in_at FROM presence
-            WHERE is_present = 1 AND checked_in_at < ?
-        """, (cutoff,))
-        stale = cursor.fetchall()
-
         cursor.execute("""
             UPDATE presence
             SET is_present = 0, checked_in_at = NULL
             WHERE is_present = 1 AND checked_in_at < ?
+            RETURNING member_id
         """, (cutoff,))
-        conn.commit()
-        return len(stale)
+        stale = cursor.fetchall()
+    if stale:
+        _forget_members(*(row[0] for row in stale))
+    return len(stale)
+
+
+MEMBER_CACHE_TTL = 60
+MEMBER_MISS_TTL = 2
+MEMBER_CACHE_MAX = 1024
+
+# member_id -> (expires_at, member or None). Misses are kept briefly so an
+# unknown tag held against the reader doesn't hit the database every poll.
+_member_cache: dict[str, tuple[float, dict | None]] = {}
+_member_cache_gen = 0
+
+
+def _forget_members(*member_ids):
+    global _member_cache_gen
+    _member_cache_gen += 1
+    for member_id in member_ids:
+        _member_cache.pop(member_id, None)
+
+
+def get_presence_version() -> int:
+    # Bumped by every write to members or presence, so anything rendered
+    # from them can be reused until it changes.
+    return _member_cache_gen
 
 
 def get_member_by_id(member_id: str) -> dict | None:
+    now = time.monotonic()
+    cached = _member_cache.get(member_id)
+    if cached and cached[0] > now:
+        member = cached[1]
+        return dict(member) if member else None
+
+    gen = _member_cache_gen
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, name, profile_picture, rowing_category, boat_class, total_seconds, passkey, username, password_hash FROM members WHERE id = ?",
-            (member_id,)
-        )
+        cursor.execute(MEMBER_BY_ID_SQL, (member_id,))
         row = cursor.fetchone()
-        return dict(row) if row else None
+        member = dict(row) if row else None
+
+    # Skip storing if a write invalidated members while we were reading.
+    if gen == _member_cache_gen:
+        if len(_member_cache) >= MEMBER_CACHE_MAX:
+            _member_cache.clear()
+        ttl = MEMBER_CACHE_TTL if member else MEMBER_MISS_TTL
+        _member_cache[member_id] = (now + ttl, member)
+    return dict(member) if member else None
 
 
 def get_member_by_id_or_passkey(identifier: str) -> dict | None:
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, name, profile_picture, rowing_category, boat_class, total_seconds, passkey, username, password_hash FROM members WHERE id = ? OR passkey = ?",
-            (identifier, identifier)
-        )
+        cursor.execute(MEMBER_BY_ID_OR_PASSKEY_SQL, (identifier, identifier, identifier))
         row = cursor.fetchone()
         return dict(row) if row else None
 
@@ -406,6 +703,7 @@ def update_profile_picture(member_id: str, filename: str) -> bool:
             (filename, member_id)
         )
         conn.commit()
+        _forget_members(member_id)
         return cursor.rowcount > 0
 
 
@@ -425,65 +723,89 @@ def get_member_presence(member_id: str) -> dict | None:
 def is_pending_tag(tag_id: str) -> bool:
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM pending_tags WHERE id = ?", (tag_id,))
-        return cursor.fetchone() is not None
+        cursor.execute("SELECT EXISTS(SELECT 1 FROM pending_tags WHERE id = ?)", (tag_id,))
+        return bool(cursor.fetchone()[0])
+
+
+# Every member id, loaded on first use and dropped whenever ids are added,
+# removed or renamed, so scans of unknown tags never touch the database.
+_member_ids: frozenset[str] | None = None
+_member_ids_gen = 0
+
+
+def _member_ids_changed():
+    global _member_ids, _member_ids_gen
+    _member_ids_gen += 1
+    _member_ids = None
 
 
 def is_registered_member(tag_id: str) -> bool:
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM members WHERE id = ?", (tag_id,))
-        return cursor.fetchone() is not None
+    global _member_ids
+    member_ids = _member_ids
+    if member_ids is None:
+        gen = _member_ids_gen
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("SELECT id FROM members")
+            member_ids = frozenset(row[0] for row in cursor.fetchall())
+        if gen == _member_ids_gen:
+            _member_ids = member_ids
+    return tag_id in member_ids
+
+
+_lightweight_mode = None
 
 
 def set_lightweight_mode(enabled: bool) -> bool:
+    global _lightweight_mode
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        """)
         cursor.execute("""
             INSERT OR REPLACE INTO settings (key, value)
             VALUES ('lightweight_mode', ?)
         """, ('1' if enabled else '0',))
         conn.commit()
-        return True
+    _lightweight_mode = bool(enabled)
+    return True
 
 
 def get_lightweight_mode() -> bool:
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        """)
-        cursor.execute("SELECT value FROM settings WHERE key = 'lightweight_mode'")
-        row = cursor.fetchone()
-        return row and row[0] == '1' if row else False
+    global _lightweight_mode
+    # Polled by every open page, so serve it from memory once loaded.
+    if _lightweight_mode is None:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM settings WHERE key = 'lightweight_mode'")
+            row = cursor.fetchone()
+            _lightweight_mode = bool(row) and row[0] == '1'
+    return _lightweight_mode
 
 
 def get_leaderboard_stats() -> dict:
     with get_db() as conn:
         cursor = conn.cursor()
 
+        # One pass over members: per-boat groups, with the NULL group only
+        # contributing to the overall totals.
         cursor.execute("""
             SELECT boat_class, SUM(total_seconds) as total, COUNT(*) as count
             FROM members
-            WHERE boat_class IS NOT NULL
             GROUP BY boat_class
         """)
         boat_stats = {}
+        total_all = 0
+        member_count = 0
         for row in cursor.fetchall():
-            boat_stats[row['boat_class']] = {
-                'total_seconds': row['total'] or 0,
-                'member_count': row['count']
-            }
-
+            total_all += row['total'] or 0
+            member_count += row['count']
+            if row['boat_class'] is not None:
+                boat_stats[row['boat_class']] = {
+                    'total_seconds': row['total'] or 0,
+                    'member_count': row['count']
+                }
+
+        cursor.row_factory = None
         cursor.execute("""
             SELECT id, name, boat_class, rowing_category, total_seconds, profile_picture
             FROM members
@@ -491,14 +813,7 @@ def get_leaderboard_stats() -> dict:
             ORDER BY total_seconds DESC
             LIMIT 10
         """)
-        top_individuals = [dict(row) for row in cursor.fetchall()]
-
-        cursor.execute("SELECT SUM(total_seconds) as total FROM members")
-        row = cursor.fetchone()
-        total_all = row['total'] or 0
-
-        cursor.execute("SELECT COUNT(*) as count FROM members")
-        member_count = cursor.fetchone()['count']
+        top_individuals = _fetch_dicts(cursor)
 
         return {
             'boat_stats': boat_stats,
@@ -523,14 +838,19 @@ def get_table_data(table_name: str, limit: int = 100) -> dict:
         if table_name not in safe_tables:
             return {'error': 'Invalid table name'}
 
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = [col[1] for col in cursor.fetchall()]
-
+        # The column names come from the SELECT itself (even when it returns
+        # no rows), so no separate PRAGMA round trip is needed.
+        cursor.row_factory = None
         cursor.execute(f"SELECT * FROM {table_name} LIMIT ?", (limit,))
-        rows = [dict(row) for row in cursor.fetchall()]
+        columns = [d[0] for d in cursor.description]
+        rows = _fetch_dicts(cursor)
+        for col, (to_text, _) in TIMESTAMP_COLUMNS.get(table_name, {}).items():
+            for row in rows:
+                if row[col] is not None:
+                    row[col] = to_text(row[col])
 
-        cursor.execute(f"SELECT COUNT(*) as count FROM {table_name}")
-        total = cursor.fetchone()['count']
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+        total = cursor.fetchone()[0]
 
         return {
             'table': table_name,
@@ -540,33 +860,56 @@ def get_table_data(table_name: str, limit: int = 100) -> dict:
         }
 
 
+# Tables the admin table editor may write to, and each one's primary key.
+EDITABLE_TABLES = {'members': 'id', 'presence': 'member_id', 'pending_tags': 'id', 'settings': 'key'}
+
+
 def update_table_row(table_name: str, primary_key: str, pk_value: str, updates: dict) -> bool:
-    safe_tables = {'members': 'id', 'presence': 'member_id', 'pending_tags': 'id', 'settings': 'key'}
-    if table_name not in safe_tables:
+    global _lightweight_mode
+    # The key column is interpolated into the SQL, so it must be the table's
+    # real primary key rather than whatever the form sent.
+    if EDITABLE_TABLES.get(table_name) != primary_key:
         return False
 
+    if table_name not in TABLE_COLUMNS:
+        with get_db() as conn:
+            load_table_columns(conn)
+    valid_columns = TABLE_COLUMNS[table_name]
+
+    # Unknown columns are dropped before touching the database; the rest go
+    # into a single UPDATE.
+    timestamp_columns = TIMESTAMP_COLUMNS.get(table_name, {})
+    set_parts = []
+    params = []
+    for col, val in updates.items():
+        if col in valid_columns and col != primary_key:
+            if col in timestamp_columns:
+                # The viewer shows these as text; store unix seconds again.
+                if not val:
+                    val = None
+                elif not val.isdigit():
+                    try:
+                        val = timestamp_columns[col][1](val)
+                    except ValueError:
+                        return False
+            set_parts.append(f"{col} = ?")
+            params.append(val)
+
+    if not set_parts:
+        return False
+
+    params.append(pk_value)
     with get_db() as conn:
         cursor = conn.cursor()
-
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        valid_columns = [col[1] for col in cursor.fetchall()]
-
-        set_parts = []
-        params = []
-        for col, val in updates.items():
-            if col in valid_columns and col != primary_key:
-                set_parts.append(f"{col} = ?")
-                params.append(val)
-
-        if not set_parts:
-            return False
-
-        params.append(pk_value)
         cursor.execute(
             f"UPDATE {table_name} SET {', '.join(set_parts)} WHERE {primary_key} = ?",
             params
         )
         conn.commit()
+        if table_name == 'settings':
+            _lightweight_mode = None
+        elif table_name in ('members', 'presence'):
+            _forget_members(pk_value)
         return cursor.rowcount > 0
 
 
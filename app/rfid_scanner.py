@@ -2,19 +2,25 @@
 RFID scanner module for RC522 reader.
 """
 
+import atexit
+import queue
 import time
 import threading
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import datetime
+from collections import OrderedDict, deque
 
 from app.config import SCAN_INTERVAL, DEBOUNCE_SECONDS, generate_uuid
 from app.models import (
-    toggle_presence, get_member_by_id, auto_checkout_stale,
+    toggle_presence, auto_checkout_stale,
     add_pending_tag, is_pending_tag, is_registered_member
 )
 
-last_scan_times: dict[str, datetime] = defaultdict(lambda: datetime.min)
-scanner_running = False
+# tag_id -> time.monotonic() of its last accepted scan, oldest first.
+last_scan_times: "OrderedDict[str, float]" = OrderedDict()
+MAX_TRACKED_TAGS = 4096
+_DEBOUNCE = float(DEBOUNCE_SECONDS)
+AUTO_CHECKOUT_INTERVAL = 300
+_stop_event = threading.Event()
 scanner_thread = None
 presence_callback = None
 registration_mode = False
@@ -27,21 +33,51 @@ last_scan_info = {
     "timestamp": None,
     "is_new_registration": False
 }
-scan_info_lock = threading.Lock()
 
-scan_history = []
 MAX_HISTORY = 10
+scan_history = deque(maxlen=MAX_HISTORY)
 history_lock = threading.Lock()
 
 
+# Callbacks run on their own thread so a slow consumer never holds up the
+# scanner; if it falls this far behind, new results are dropped.
+_callback_queue = queue.Queue(maxsize=64)
+_callback_thread = None
+
+
+def _callback_worker():
+    while True:
+        result = _callback_queue.get()
+        callback = presence_callback
+        if callback:
+            try:
+                callback(result)
+            except Exception as e:
+                print(f"Presence callback error: {e}")
+
+
+def notify_presence(result: dict):
+    # Every presence change goes through here, whether it came from the
+    # reader, the web UI or the stale sweep, so displays hear about it.
+    if presence_callback:
+        try:
+            _callback_queue.put_nowait(result)
+        except queue.Full:
+            pass
+
+
 def set_presence_callback(callback):
-    global presence_callback
+    global presence_callback, _callback_thread
     presence_callback = callback
+    if _callback_thread is None:
+        _callback_thread = threading.Thread(target=_callback_worker, daemon=True)
+        _callback_thread.start()
 
 
 def get_last_scan_info():
-    with scan_info_lock:
-        return last_scan_info.copy()
+    # Writers always publish a new dict rather than mutating this one, so the
+    # reference can be handed out as-is; treat it as read-only.
+    return last_scan_info
 
 
 def get_scan_history():
@@ -50,11 +86,8 @@ def get_scan_history():
 
 
 def add_to_history(scan_info: dict):
-    global scan_history
     with history_lock:
-        scan_history.insert(0, scan_info.copy())
-        if len(scan_history) > MAX_HISTORY:
-            scan_history = scan_history[:MAX_HISTORY]
+        scan_history.appendleft(scan_info.copy())
 
 
 def set_registration_mode(enabled: bool):
@@ -70,64 +103,77 @@ def is_registration_mode():
 
 
 def uid_to_string(uid: list) -> str:
-    return ''.join(format(x, '02x') for x in uid)
+    return bytes(uid).hex()
 
 
 def handle_scan(tag_id: str) -> dict | None:
     global last_scan_times, last_scan_info
 
-    now = datetime.now()
+    scanned_at = time.monotonic()
 
-    if now - last_scan_times[tag_id] < timedelta(seconds=DEBOUNCE_SECONDS):
+    if scanned_at - last_scan_times.get(tag_id, -_DEBOUNCE) < _DEBOUNCE:
         return None
 
-    last_scan_times[tag_id] = now
-    member = get_member_by_id(tag_id)
+    last_scan_times[tag_id] = scanned_at
+    last_scan_times.move_to_end(tag_id)
+    # Entries are in scan order, so anything past the debounce window sits
+    # at the front and can be swept without looking at the rest. The tag
+    # just stored is last and never swept.
+    while len(last_scan_times) > MAX_TRACKED_TAGS or (
+            len(last_scan_times) > 1 and
+            scanned_at - next(iter(last_scan_times.values())) >= _DEBOUNCE):
+        last_scan_times.popitem(last=False)
+
+    # Format the accepted scan's time once; the log prefix is a slice of it.
+    timestamp = datetime.now().isoformat()
+    clock = timestamp[11:19]
+    # Unknown tags are rejected from the in-memory member-id set before any
+    # write transaction is opened.
+    registered = is_registered_member(tag_id)
+    result = toggle_presence(tag_id) if registered else None
 
-    if member:
-        result = toggle_presence(tag_id)
-        if result:
-            status = "IN" if result["is_present"] else "OUT"
-            print(f"[{now.strftime('%H:%M:%S')}] {result['name']} checked {status}")
+    if result:
+        status = "IN" if result["is_present"] else "OUT"
+        print(f"[{clock}] {result['name']} checked {status}")
 
-            with scan_info_lock:
-                last_scan_info = {
-                    "tag_id": tag_id,
-                    "member_name": result["name"],
-                    "action": result["action"],
-                    "timestamp": now.isoformat(),
-                    "is_new_registration": False
-                }
+        last_scan_info = {
+            "tag_id": tag_id,
+            "member_name": result["name"],
+            "action": result["action"],
+            "timestamp": timestamp,
+            "is_new_registration": False
+        }
 
-            add_to_history(last_scan_info)
+        add_to_history(last_scan_info)
 
-            if presence_callback:
-                presence_callback(result)
+        notify_presence(result)
 
         return result
 
+    elif registered:
+        # A member whose presence row is missing; not an unknown tag.
+        return None
+
     elif is_pending_tag(tag_id):
-        print(f"[{now.strftime('%H:%M:%S')}] Pending tag scanned: {tag_id}")
-        with scan_info_lock:
-            last_scan_info = {
-                "tag_id": tag_id,
-                "member_name": None,
-                "action": "pending",
-                "timestamp": now.isoformat(),
-                "is_new_registration": False
-            }
+        print(f"[{clock}] Pending tag scanned: {tag_id}")
+        last_scan_info = {
+            "tag_id": tag_id,
+            "member_name": None,
+            "action": "pending",
+            "timestamp": timestamp,
+            "is_new_registration": False
+        }
         return None
 
     else:
-        print(f"[{now.strftime('%H:%M:%S')}] Unknown tag: {tag_id}")
-        with scan_info_lock:
-            last_scan_info = {
-                "tag_id": tag_id,
-                "member_name": None,
-                "action": "unknown",
-                "timestamp": now.isoformat(),
-                "is_new_registration": False
-            }
+        print(f"[{clock}] Unknown tag: {tag_id}")
+        last_scan_info = {
+            "tag_id": tag_id,
+            "member_name": None,
+            "action": "unknown",
+            "timestamp": timestamp,
+            "is_new_registration": False
+        }
         return None
 
 
@@ -145,14 +191,13 @@ def handle_registration_scan(reader) -> dict | None:
 
         print(f"[{now.strftime('%H:%M:%S')}] Tag registered with UUID: {new_uuid}")
 
-        with scan_info_lock:
-            last_scan_info = {
-                "tag_id": new_uuid,
-                "member_name": None,
-                "action": "registered",
-                "timestamp": now.isoformat(),
-                "is_new_registration": True
-            }
+        last_scan_info = {
+            "tag_id": new_uuid,
+            "member_name": None,
+            "action": "registered",
+            "timestamp": now.isoformat(),
+            "is_new_registration": True
+        }
 
         return {"tag_id": new_uuid, "action": "registered"}
 
@@ -162,8 +207,6 @@ def handle_registration_scan(reader) -> dict | None:
 
 
 def scanner_loop_rfid():
-    global scanner_running
-
     try:
         from mfrc522 import SimpleMFRC522
         import RPi.GPIO as GPIO
@@ -173,13 +216,14 @@ def scanner_loop_rfid():
         print("RFID Scanner started (RC522)")
         print("Waiting for RFID tags...")
 
-        last_auto_checkout = datetime.now()
+        next_auto_checkout = time.monotonic() + AUTO_CHECKOUT_INTERVAL
 
-        while scanner_running:
+        while not _stop_event.is_set():
             try:
+                # Both modes poll without blocking, so waiting for a tag is
+                # the wait below rather than a busy loop inside the library.
                 if is_registration_mode():
-                    print("Waiting for tag to register...")
-                    id, text = reader.read()
+                    id, text = reader.read_no_block()
                     if id:
                         handle_registration_scan(reader)
                         set_registration_mode(False)
@@ -190,17 +234,19 @@ def scanner_loop_rfid():
                         tag_id = text.strip() if text and text.strip() else format(id, 'x')
                         handle_scan(tag_id)
 
-                if datetime.now() - last_auto_checkout > timedelta(minutes=5):
+                if time.monotonic() >= next_auto_checkout:
                     stale_count = auto_checkout_stale()
                     if stale_count:
                         print(f"Auto-checked out {stale_count} stale members")
-                    last_auto_checkout = datetime.now()
+                        notify_presence({"action": "auto_checkout", "count": stale_count})
+                    next_auto_checkout = time.monotonic() + AUTO_CHECKOUT_INTERVAL
 
-                time.sleep(SCAN_INTERVAL)
+                # Returns early when stop_scanner() is called.
+                _stop_event.wait(SCAN_INTERVAL)
 
             except Exception as e:
                 print(f"RFID read error: {e}")
-                time.sleep(1)
+                _stop_event.wait(1)
 
         GPIO.cleanup()
         print("RFID Scanner stopped")
@@ -212,28 +258,26 @@ def scanner_loop_rfid():
 
 
 def scanner_loop_test():
-    global scanner_running
-
     print("Scanner running in TEST MODE (no RFID reader)")
     print("Use /admin to simulate scans")
 
-    while scanner_running:
-        time.sleep(60)
+    while not _stop_event.wait(60):
         stale_count = auto_checkout_stale()
         if stale_count:
             print(f"Auto-checked out {stale_count} stale members")
+            notify_presence({"action": "auto_checkout", "count": stale_count})
 
     print("Test scanner stopped")
 
 
 def start_scanner(use_rfid: bool = True):
-    global scanner_running, scanner_thread
+    global scanner_thread
 
-    if scanner_running:
+    if scanner_thread is not None and scanner_thread.is_alive():
         print("Scanner already running")
         return
 
-    scanner_running = True
+    _stop_event.clear()
 
     if use_rfid:
         scanner_thread = threading.Thread(target=scanner_loop_rfid, daemon=True)
@@ -243,52 +287,58 @@ def start_scanner(use_rfid: bool = True):
     scanner_thread.start()
 
 
+STOP_TIMEOUT = 0.5
+
+
 def stop_scanner():
-    global scanner_running
-    scanner_running = False
+    # Give the loop a moment to notice and release the reader (GPIO.cleanup)
+    # instead of leaving it to die with the process.
+    _stop_event.set()
+    thread = scanner_thread
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(STOP_TIMEOUT)
+
+
+# Also covers servers that exit without going through run.py's handler.
+atexit.register(stop_scanner)
 
 
 def simulate_scan(member_id: str) -> dict | None:
-    member = get_member_by_id(member_id)
-    if not member:
-        return None
+    global last_scan_info
 
     result = toggle_presence(member_id)
 
     if result:
-        with scan_info_lock:
-            global last_scan_info
-            last_scan_info = {
-                "tag_id": member_id,
-                "member_name": result["name"],
-                "action": result["action"],
-                "timestamp": datetime.now().isoformat(),
-                "is_new_registration": False
-            }
+        last_scan_info = {
+            "tag_id": member_id,
+            "member_name": result["name"],
+            "action": result["action"],
+            "timestamp": datetime.now().isoformat(),
+            "is_new_registration": False
+        }
 
         add_to_history(last_scan_info)
 
-        if presence_callback:
-            presence_callback(result)
+        notify_presence(result)
 
     return result
 
 
 def simulate_registration() -> dict | None:
+    global last_scan_info
+
     new_uuid = generate_uuid()
     add_pending_tag(new_uuid)
 
     now = datetime.now()
 
-    with scan_info_lock:
-        global last_scan_info
-        last_scan_info = {
-            "tag_id": new_uuid,
-            "member_name": None,
-            "action": "registered",
-            "timestamp": now.isoformat(),
-            "is_new_registration": True
-        }
+    last_scan_info = {
+        "tag_id": new_uuid,
+        "member_name": None,
+        "action": "registered",
+        "timestamp": now.isoformat(),
+        "is_new_registration": True
+    }
 
     print(f"[{now.strftime('%H:%M:%S')}] Simulated registration: {new_uuid}")
 
@@ -298,9 +348,8 @@ def simulate_registration() -> dict | None:
 if __name__ == "__main__":
     from app.models import init_db
     init_db()
-    
-    scanner_running = True
+
     try:
         scanner_loop_rfid()
     except KeyboardInterrupt:
-        scanner_running = False
+        _stop_event.set()
@@ -1,32 +1,113 @@
+import array
+import gzip
+import hmac
+import ipaddress
 import os
-from functools import wraps
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session, flash
+import json
+import platform
+import queue
+import socket
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from hashlib import md5
+from functools import lru_cache, wraps
+from flask import Blueprint, Flask, Request, Response, g, render_template, jsonify, request, redirect, session, flash, make_response
+from flask import url_for as flask_url_for
+from flask.sessions import SecureCookieSessionInterface
+import pyotp
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.utils import secure_filename
 from app.config import (
-    SECRET_KEY, WEB_HOST, WEB_PORT, UPLOAD_DIR,
-    MAX_CONTENT_LENGTH, ALLOWED_EXTENSIONS, ADMIN_PASSWORD, ADMIN_TOTP_SECRET
+    SECRET_KEY, WEB_HOST, WEB_PORT, DB_PATH, UPLOAD_DIR, TEMPLATE_CACHE_DIR,
+    MAX_CONTENT_LENGTH, USE_X_SENDFILE, X_ACCEL_PREFIX, ALLOWED_EXTENSIONS, ADMIN_PASSWORD, ADMIN_TOTP_SECRET
 )
 from app.models import (
-    get_present_members, get_all_members, init_db,
+    get_present_members, get_all_members, iter_all_members, init_db,
     get_member_by_id, get_member_by_id_or_passkey, get_member_by_username,
     update_profile_picture, get_member_presence,
     get_pending_tags, create_member, delete_member, update_member,
     update_member_uuid, remove_pending_tag, set_lightweight_mode,
     get_lightweight_mode, get_leaderboard_stats, get_all_tables,
     get_table_data, update_table_row, auto_checkout_stale, toggle_presence,
-    hash_password, check_password
+    hash_password, check_password, get_presence_version
 )
 from app.rfid_scanner import (
     start_scanner, stop_scanner, simulate_scan, set_presence_callback,
     get_last_scan_info, set_registration_mode, is_registration_mode,
-    simulate_registration, get_scan_history
+    simulate_registration, get_scan_history, notify_presence
 )
 
+class PollingSessionInterface(SecureCookieSessionInterface):
+    # The display polls these paths constantly and none of them read or write
+    # the session, so skip verifying the signed cookie for them.
+    SESSIONLESS_PREFIXES = ("/static/", "/fragment/", "/events")
+    SESSIONLESS_PATHS = frozenset({
+        "/api/present", "/api/state", "/api/last_scan",
+        "/api/scan_history", "/api/lightweight_mode",
+    })
+
+    def open_session(self, app, request):
+        path = request.path
+        if path in self.SESSIONLESS_PATHS or path.startswith(self.SESSIONLESS_PREFIXES):
+            return self.make_null_session(app)
+        return super().open_session(app, request)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Only the photo upload spools into UPLOAD_DIR, which is served
+        # publicly; file parts sent to any other route go to an anonymous
+        # temp file as usual.
+        if self.endpoint != "upload_photo":
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        # Spooling there instead of an anonymous temp file lets upload_photo
+        # rename one into place. Anything not renamed is removed in
+        # remove_upload_spool.
+        stream = tempfile.NamedTemporaryFile("w+b", dir=UPLOAD_DIR, prefix=".upload-",
+                                             suffix=".tmp", delete=False)
+        self.__dict__.setdefault("upload_spool", []).append(stream)
+        return stream
+
+
 app = Flask(__name__,
             template_folder="../templates",
             static_folder="../static")
+app.request_class = UploadRequest
 app.secret_key = SECRET_KEY
+app.session_interface = PollingSessionInterface()
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.config['USE_X_SENDFILE'] = USE_X_SENDFILE or bool(X_ACCEL_PREFIX)
+# Werkzeug's X-Sendfile paths start with this; see accel_redirect.
+STATIC_ROOT = os.path.join(app.static_folder, "")
+# Compiled templates survive restarts, so startup skips recompiling them.
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(TEMPLATE_CACHE_DIR))
+# Responses are read by our own scripts, so skip sorting every dict's keys.
+app.json.sort_keys = False
+
+# Admin pages and the JSON API each live under one prefix; they are
+# registered on the app once every route has been declared (see the bottom
+# of this module).
+admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
+api_bp = Blueprint("api", __name__, url_prefix="/api")
+
+
+@lru_cache(maxsize=1024)
+def _cached_url_for(endpoint: str, script_root: str, values: tuple) -> str:
+    return flask_url_for(endpoint, **dict(values))
+
+
+def url_for(endpoint: str, **values) -> str:
+    # Every redirect builds one of a handful of URLs; resolve each once.
+    # The script root is part of the key in case the app is mounted under
+    # a prefix.
+    return _cached_url_for(endpoint, request.script_root, tuple(sorted(values.items())))
+
+
+app.jinja_env.globals["url_for"] = url_for
 
 
 @app.template_filter('fmt_hours')
@@ -39,40 +120,177 @@ def fmt_hours_filter(seconds):
     return f"{hours}h {minutes}m"
 
 
+# fdatasync is Linux-only; fall back to fsync when developing elsewhere.
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
 def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    # Returns the lower-cased extension when it is allowed, so callers can
+    # reuse it instead of splitting the name again.
+    i = filename.rfind('.')
+    if i == -1:
+        return None
+    ext = filename[i + 1:].lower()
+    return ext if ext in ALLOWED_EXTENSIONS else None
+
+
+# Leading bytes of each allowed image type, keyed by extension. WebP is a
+# RIFF container and is checked separately.
+_IMAGE_MAGIC = {
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "jpg": (b"\xff\xd8\xff",),
+    "jpeg": (b"\xff\xd8\xff",),
+    "gif": (b"GIF87a", b"GIF89a"),
+}
+
+
+def _has_image_signature(stream, ext: str) -> bool:
+    # Peek at the header so a mislabelled upload is rejected before it is
+    # written to disk.
+    head = stream.read(12)
+    stream.seek(0)
+    if ext == "webp":
+        return head.startswith(b"RIFF") and head.startswith(b"WEBP", 8)
+    return head.startswith(_IMAGE_MAGIC[ext])
 
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not session.get("is_admin"):
-            return redirect(url_for("admin_login"))
+            return redirect(url_for("admin.admin_login"))
         return f(*args, **kwargs)
     return decorated_function
 
 
+# Everything under /admin except signing in and out needs an admin session.
+ADMIN_OPEN_ENDPOINTS = frozenset({"admin.admin_login", "admin.admin_logout"})
+
+
+@admin_bp.before_request
+def require_admin():
+    if not session.get("is_admin") and request.endpoint not in ADMIN_OPEN_ENDPOINTS:
+        return redirect(url_for("admin.admin_login"))
+
+
+# One queue per open /events stream. Scans are pushed to every client, so
+# pages only re-fetch when presence actually changes instead of polling.
+_event_clients: set[queue.Queue] = set()
+_event_clients_lock = threading.Lock()
+EVENT_KEEPALIVE_SECONDS = 15
+
+
 def notify_clients(data: dict):
-    pass
+    with _event_clients_lock:
+        clients = list(_event_clients)
+    if not clients:
+        return
+    # Push the same state /api/state serves, plus the rendered present list,
+    # so a connected display updates without fetching anything. Built once
+    # per scan, however many displays are listening.
+    with app.app_context():
+        payload = _state_payload(get_present_members(), get_last_scan_info(), get_scan_history())
+        payload["present_html"] = _current_present_fragment()["html"]
+    message = f"event: presence\ndata: {json.dumps(payload)}\n\n"
+    for client in clients:
+        try:
+            client.put_nowait(message)
+        except queue.Full:
+            pass
+
+
+# Static files are recognised by endpoint (the URL is already matched by the
+# time before_request runs); these prefixes stay reachable when closed.
+OPEN_PATHS = ('/admin', '/closed')
+# Whether we're open can only change on the hour, so the answer is kept
+# until the next local hour boundary.
+_open_hours_cache = {"until": 0, "open": False}
 
 
 def is_open_hours():
-    from datetime import datetime
-    hour = datetime.now().hour
-    return 6 <= hour < 22
+    now = time.time()
+    if now >= _open_hours_cache["until"]:
+        local = time.localtime(now)
+        _open_hours_cache["open"] = 6 <= local.tm_hour < 22
+        _open_hours_cache["until"] = int(now) + (59 - local.tm_min) * 60 + (60 - min(local.tm_sec, 59))
+    return _open_hours_cache["open"]
+
+
+COMPRESSIBLE_MIMETYPES = frozenset({"text/html", "application/json"})
+
+
+@app.after_request
+def gzip_response(response):
+    # Pages like the admin dashboard and leaderboard are large, repetitive
+    # HTML. Cached fragments arrive already compressed and are left alone.
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not request.accept_encodings["gzip"]:
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, 6))
+    response.headers["Content-Encoding"] = "gzip"
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + "-gz", weak)
+    return response
+
+
+@app.after_request
+def accel_redirect(response):
+    # Werkzeug names the file by its absolute path; nginx wants a URI inside
+    # its internal location instead.
+    path = response.headers.get("X-Sendfile")
+    if X_ACCEL_PREFIX and path and path.startswith(STATIC_ROOT):
+        del response.headers["X-Sendfile"]
+        response.headers["X-Accel-Redirect"] = X_ACCEL_PREFIX + path[len(STATIC_ROOT) - 1:]
+    return response
+
+
+@app.teardown_request
+def remove_upload_spool(exc=None):
+    for stream in request.__dict__.get("upload_spool", ()):
+        stream.close()
+        try:
+            os.unlink(stream.name)
+        except FileNotFoundError:
+            pass
 
 
 @app.before_request
 def check_open_hours():
-    open_paths = ['/static/', '/admin', '/closed']
-    path = request.path
-    if any(path.startswith(p) for p in open_paths):
+    if request.endpoint == 'static' or request.path.startswith(OPEN_PATHS):
         return None
     if not is_open_hours():
         return render_template("closed.html"), 200
 
 
+# Per-request memo of the home page data, so a request that needs the same
+# list in more than one place only queries it once.
+def cached_present() -> list:
+    if "present" not in g:
+        g.present = get_present_members()
+    return g.present
+
+
+def cached_last_scan() -> dict:
+    if "last_scan" not in g:
+        g.last_scan = get_last_scan_info()
+    return g.last_scan
+
+
+def cached_history() -> list:
+    if "history" not in g:
+        g.history = get_scan_history()
+    return g.history
+
+
 @app.route("/closed")
 def closed_preview():
     return render_template("closed.html")
@@ -80,32 +298,99 @@ def closed_preview():
 
 @app.route("/")
 def index():
-    present = get_present_members()
-    last_scan = get_last_scan_info()
-    history = get_scan_history()
+    present = cached_present()
+    last_scan = cached_last_scan()
+    history = cached_history()
     return render_template("index.html", present=present, last_scan=last_scan, scan_history=history)
 
 
-@app.route("/api/present")
+def _present_etag() -> str:
+    # Durations tick every second while anyone is checked in.
+    version = get_presence_version()
+    now = int(time.time())
+    return f"{version}.{now}" if cached_present() else str(version)
+
+
+def _scan_etag() -> str:
+    # Every scan publishes a new last_scan_info with a fresh timestamp, and
+    # history only grows alongside it.
+    return get_last_scan_info()["timestamp"] or "none"
+
+
+def _conditional_json(etag: str, build):
+    # Pollers send back the ETag they were given; if nothing has changed they
+    # get a bodyless 304 and the payload is never built or serialized.
+    for tag in (etag, etag + "-gz"):
+        if tag in request.if_none_match:
+            response = app.response_class(status=304)
+            response.set_etag(tag)
+            break
+    else:
+        response = jsonify(build())
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@api_bp.route("/present")
 def api_present():
-    present = get_present_members()
-    return jsonify({
-        "count": len(present),
-        "members": present
+    return _conditional_json(_present_etag(), lambda: {
+        "count": len(cached_present()),
+        "members": cached_present()
     })
 
 
-@app.route("/api/last_scan")
+def _state_payload(present: list, last_scan: dict, history: list) -> dict:
+    return {
+        "present": {"count": len(present), "members": present},
+        "last_scan": last_scan,
+        "history": history,
+        "lightweight": get_lightweight_mode()
+    }
+
+
+@api_bp.route("/state")
+def api_state():
+    # Everything the home page polls for, in one request.
+    etag = f"{_present_etag()}:{_scan_etag()}:{int(get_lightweight_mode())}"
+    return _conditional_json(etag, lambda: _state_payload(
+        cached_present(), cached_last_scan(), cached_history()))
+
+
+@api_bp.route("/last_scan")
 def api_last_scan():
-    return jsonify(get_last_scan_info())
+    return _conditional_json(_scan_etag(), cached_last_scan)
 
 
-@app.route("/api/scan_history")
+@api_bp.route("/scan_history")
 def api_scan_history():
-    return jsonify(get_scan_history())
+    return _conditional_json(_scan_etag(), cached_history)
+
 
+@app.route("/events")
+def events():
+    client = queue.Queue(maxsize=16)
+    with _event_clients_lock:
+        _event_clients.add(client)
 
-@app.route("/api/lightweight_mode")
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    yield client.get(timeout=EVENT_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            with _event_clients_lock:
+                _event_clients.discard(client)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@api_bp.route("/lightweight_mode")
 def api_lightweight_mode():
     return jsonify({"enabled": get_lightweight_mode()})
 
@@ -180,10 +465,14 @@ def setup_account():
     return render_template("setup_account.html", member=member)
 
 
+def _clear_member_session():
+    for key in ("member_id", "member_name"):
+        session.pop(key, None)
+
+
 @app.route("/logout")
 def logout():
-    session.pop("member_id", None)
-    session.pop("member_name", None)
+    _clear_member_session()
     return redirect(url_for("index"))
 
 
@@ -194,8 +483,7 @@ def profile():
 
     member = get_member_presence(session["member_id"])
     if not member:
-        session.pop("member_id", None)
-        session.pop("member_name", None)
+        _clear_member_session()
         return redirect(url_for("login"))
 
     return render_template("profile.html", member=member)
@@ -225,7 +513,9 @@ def virtual_checkout():
 
     member = get_member_presence(session["member_id"])
     if member and member["is_present"]:
-        toggle_presence(session["member_id"])
+        result = toggle_presence(session["member_id"])
+        if result:
+            notify_presence(result)
         flash("You've been checked out!", "success")
     else:
         flash("You're not currently checked in", "error")
@@ -284,17 +574,31 @@ def upload_photo():
         flash("No file selected", "error")
         return redirect(url_for("profile"))
 
-    if file and allowed_file(file.filename):
-        ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"{session['member_id']}.{ext}"
-
-        for old_ext in ALLOWED_EXTENSIONS:
-            old_file = UPLOAD_DIR / f"{session['member_id']}.{old_ext}"
-            if old_file.exists() and old_ext != ext:
-                old_file.unlink()
+    ext = allowed_file(file.filename) if file else None
+    if ext and not _has_image_signature(file.stream, ext):
+        ext = None
+    if ext:
+        prefix = secure_filename(session['member_id'])
+        filename = f"{prefix}.{ext}"
+
+        # One directory scan finds any earlier picture saved under another
+        # extension, instead of a stat() per allowed extension.
+        for old_file in UPLOAD_DIR.glob(f"{prefix}.*"):
+            if old_file.name != filename:
+                try:
+                    old_file.unlink()
+                except FileNotFoundError:
+                    pass
 
         filepath = UPLOAD_DIR / filename
-        file.save(filepath)
+        # The upload was spooled straight into UPLOAD_DIR (see UploadRequest),
+        # so saving it is a rename rather than a copy, and a half-written
+        # picture is never served.
+        stream = file.stream
+        stream.flush()
+        _fdatasync(stream.fileno())
+        os.chmod(stream.name, 0o644)
+        os.replace(stream.name, filepath)
 
         update_profile_picture(session["member_id"], filename)
 
@@ -305,59 +609,83 @@ def upload_photo():
     return redirect(url_for("profile"))
 
 
-_admin_attempts = {}
-
-@app.route("/admin/login", methods=["GET", "POST"])
+# Failed admin logins per IP, oldest first: at most 5 per 15 minutes.
+ADMIN_MAX_ATTEMPTS = 5
+ADMIN_ATTEMPT_WINDOW = 900
+_admin_attempts: dict[str, deque] = {}
+_admin_attempts_lock = threading.Lock()
+# compare_digest only accepts ASCII str, so compare the UTF-8 bytes instead.
+_ADMIN_PASSWORD_BYTES = ADMIN_PASSWORD.encode()
+
+
+def _admin_login_blocked(ip: str, now: float) -> bool:
+    with _admin_attempts_lock:
+        attempts = _admin_attempts.get(ip)
+        if attempts is None:
+            return False
+        while attempts and now - attempts[0] >= ADMIN_ATTEMPT_WINDOW:
+            attempts.popleft()
+        if not attempts:
+            del _admin_attempts[ip]
+            return False
+        return len(attempts) >= ADMIN_MAX_ATTEMPTS
+
+
+def _record_admin_failure(ip: str, now: float):
+    with _admin_attempts_lock:
+        _admin_attempts.setdefault(ip, deque()).append(now)
+        # Forget IPs whose attempts have all expired so the table can't grow
+        # without bound; only done once it is large enough to matter.
+        if len(_admin_attempts) > 1024:
+            for stale in [k for k, v in _admin_attempts.items()
+                          if now - v[-1] >= ADMIN_ATTEMPT_WINDOW]:
+                del _admin_attempts[stale]
+
+
+def _clear_admin_failures(ip: str):
+    with _admin_attempts_lock:
+        _admin_attempts.pop(ip, None)
+
+@admin_bp.route("/login", methods=["GET", "POST"])
 def admin_login():
-    import time
     ip = request.remote_addr
 
     if request.method == "POST":
-        # Rate limiting: max 5 attempts per 15 minutes
-        now = time.time()
-        attempts = _admin_attempts.get(ip, [])
-        attempts = [t for t in attempts if now - t < 900]
-        _admin_attempts[ip] = attempts
-
-        if len(attempts) >= 5:
+        now = time.monotonic()
+        if _admin_login_blocked(ip, now):
             flash("Too many attempts. Try again later.", "error")
             return render_template("admin_login.html")
 
         password = request.form.get("password", "")
         totp_code = request.form.get("totp_code", "").strip()
 
-        import hmac
-        if not hmac.compare_digest(password, ADMIN_PASSWORD):
-            attempts.append(now)
-            _admin_attempts[ip] = attempts
+        if not hmac.compare_digest(password.encode(), _ADMIN_PASSWORD_BYTES):
+            _record_admin_failure(ip, now)
             flash("Invalid password", "error")
         elif ADMIN_TOTP_SECRET:
-            import pyotp
             totp = pyotp.TOTP(ADMIN_TOTP_SECRET)
             if totp.verify(totp_code, valid_window=1):
                 session["is_admin"] = True
-                _admin_attempts.pop(ip, None)
-                return redirect(url_for("admin"))
+                _clear_admin_failures(ip)
+                return redirect(url_for("admin.admin"))
             else:
-                attempts.append(now)
-                _admin_attempts[ip] = attempts
+                _record_admin_failure(ip, now)
                 flash("Invalid 2FA code", "error")
         else:
             session["is_admin"] = True
-            _admin_attempts.pop(ip, None)
-            return redirect(url_for("admin"))
+            _clear_admin_failures(ip)
+            return redirect(url_for("admin.admin"))
 
     return render_template("admin_login.html", totp_enabled=bool(ADMIN_TOTP_SECRET))
 
 
-@app.route("/admin/logout")
+@admin_bp.route("/logout")
 def admin_logout():
     session.pop("is_admin", None)
     return redirect(url_for("index"))
 
 
-@app.route("/admin")
-@admin_required
+@admin_bp.route("")
 def admin():
     members = get_all_members()
     pending = get_pending_tags()
@@ -366,49 +694,37 @@ def admin():
     return render_template("admin.html", members=members, pending=pending, registration_mode=reg_mode, lightweight_mode=lw_mode)
 
 
-@app.route("/admin/register/start", methods=["POST"])
-@admin_required
-def admin_start_registration():
-    set_registration_mode(True)
-    flash("Registration mode enabled. Tap a tag to register it.", "success")
-    return redirect(url_for("admin"))
-
-
-@app.route("/admin/register/stop", methods=["POST"])
-@admin_required
-def admin_stop_registration():
-    set_registration_mode(False)
-    flash("Registration mode disabled.", "success")
-    return redirect(url_for("admin"))
+@admin_bp.route("/register/<any(start, stop):state>", methods=["POST"])
+def admin_set_registration(state):
+    enabled = state == "start"
+    set_registration_mode(enabled)
+    if enabled:
+        flash("Registration mode enabled. Tap a tag to register it.", "success")
+    else:
+        flash("Registration mode disabled.", "success")
+    return redirect(url_for("admin.admin"))
 
 
-@app.route("/admin/register/simulate", methods=["POST"])
-@admin_required
+@admin_bp.route("/register/simulate", methods=["POST"])
 def admin_simulate_registration():
     result = simulate_registration()
     if result:
         flash(f"Simulated tag registered: {result['tag_id']}", "success")
-    return redirect(url_for("admin"))
-
-
-@app.route("/admin/lightweight_mode/enable", methods=["POST"])
-@admin_required
-def admin_enable_lightweight_mode():
-    set_lightweight_mode(True)
-    flash("Lightweight mode enabled. Home page will only show LM category.", "success")
-    return redirect(url_for("admin"))
+    return redirect(url_for("admin.admin"))
 
 
-@app.route("/admin/lightweight_mode/disable", methods=["POST"])
-@admin_required
-def admin_disable_lightweight_mode():
-    set_lightweight_mode(False)
-    flash("Lightweight mode disabled. Home page will show all categories.", "success")
-    return redirect(url_for("admin"))
+@admin_bp.route("/lightweight_mode/<any(enable, disable):state>", methods=["POST"])
+def admin_set_lightweight_mode(state):
+    enabled = state == "enable"
+    set_lightweight_mode(enabled)
+    if enabled:
+        flash("Lightweight mode enabled. Home page will only show LM category.", "success")
+    else:
+        flash("Lightweight mode disabled. Home page will show all categories.", "success")
+    return redirect(url_for("admin.admin"))
 
 
-@app.route("/admin/member/create", methods=["POST"])
-@admin_required
+@admin_bp.route("/member/create", methods=["POST"])
 def admin_create_member():
     tag_id = request.form.get("tag_id", "").strip()
     name = request.form.get("name", "").strip()
@@ -417,23 +733,22 @@ def admin_create_member():
 
     if not tag_id or not name or not rowing_category:
         flash("All fields are required", "error")
-        return redirect(url_for("admin"))
+        return redirect(url_for("admin.admin"))
 
     if create_member(tag_id, name, rowing_category, boat_class):
         flash(f"Member '{name}' created successfully!", "success")
     else:
         flash("Failed to create member. Tag may already be registered.", "error")
 
-    return redirect(url_for("admin"))
+    return redirect(url_for("admin.admin"))
 
 
-@app.route("/admin/member/<member_id>/edit", methods=["GET", "POST"])
-@admin_required
+@admin_bp.route("/member/<member_id>/edit", methods=["GET", "POST"])
 def admin_edit_member(member_id):
     member = get_member_by_id(member_id)
     if not member:
         flash("Member not found", "error")
-        return redirect(url_for("admin"))
+        return redirect(url_for("admin.admin"))
 
     if request.method == "POST":
         name = request.form.get("name", "").strip()
@@ -450,7 +765,7 @@ def admin_edit_member(member_id):
             existing = get_member_by_username(username)
             if existing and existing["id"] != member_id:
                 flash("Username already taken.", "error")
-                return redirect(url_for("admin_edit_member", member_id=member_id))
+                return redirect(url_for("admin.admin_edit_member", member_id=member_id))
             kwargs["username"] = username
         else:
             kwargs["username"] = None
@@ -464,39 +779,38 @@ def admin_edit_member(member_id):
         if new_uuid and new_uuid != member_id:
             if update_member_uuid(member_id, new_uuid):
                 flash(f"UUID updated to {new_uuid}", "success")
-                return redirect(url_for("admin_edit_member", member_id=new_uuid))
+                return redirect(url_for("admin.admin_edit_member", member_id=new_uuid))
             else:
                 flash("Failed to update UUID. It may already be in use.", "error")
 
         flash("Member updated!", "success")
-        return redirect(url_for("admin"))
+        return redirect(url_for("admin.admin"))
 
     return render_template("admin_edit_member.html", member=member)
 
 
-@app.route("/admin/member/<member_id>/delete", methods=["POST"])
-@admin_required
+@admin_bp.route("/member/<member_id>/delete", methods=["POST"])
 def admin_delete_member(member_id):
     if delete_member(member_id):
+        notify_presence({"action": "deleted", "member_id": member_id})
         flash("Member deleted", "success")
     else:
         flash("Failed to delete member", "error")
 
-    return redirect(url_for("admin"))
+    return redirect(url_for("admin.admin"))
 
 
-@app.route("/admin/pending/<tag_id>/delete", methods=["POST"])
-@admin_required
+@admin_bp.route("/pending/<tag_id>/delete", methods=["POST"])
 def admin_delete_pending(tag_id):
     if remove_pending_tag(tag_id):
         flash("Pending tag removed", "success")
     else:
         flash("Failed to remove pending tag", "error")
 
-    return redirect(url_for("admin"))
+    return redirect(url_for("admin.admin"))
 
 
-@app.route("/api/simulate/<member_id>", methods=["POST"])
+@api_bp.route("/simulate/<member_id>", methods=["POST"])
 @admin_required
 def api_simulate(member_id: str):
     result = simulate_scan(member_id)
@@ -511,27 +825,30 @@ def tap_landing():
     if saved_id:
         member = get_member_by_id(saved_id)
         if member:
-            toggle_presence(saved_id)
+            result = toggle_presence(saved_id)
+            if result:
+                notify_presence(result)
             return redirect(url_for("index"))
     return render_template("tap.html")
 
 
 @app.route("/tap/in")
 def tap_checkin():
-    members = get_all_members()
-    out_members = [m for m in members if not m.get("is_present")]
+    out_members = [m for m in iter_all_members() if not m["is_present"]]
     return render_template("tap_list.html", members=out_members, action="in")
 
 
 @app.route("/tap/out")
 def tap_checkout():
-    present = get_present_members()
+    present = cached_present()
     return render_template("tap_list.html", members=present, action="out")
 
 
 @app.route("/tap/toggle/<member_id>", methods=["POST"])
 def tap_toggle(member_id):
-    toggle_presence(member_id)
+    result = toggle_presence(member_id)
+    if result:
+        notify_presence(result)
     resp = redirect(url_for("index"))
     resp.set_cookie("tap_member_id", member_id, max_age=365*24*3600, samesite="Lax")
     return resp
@@ -544,10 +861,21 @@ def tap_reset():
     return resp
 
 
+_members_page = {"key": None, "html": None, "gzip": None, "etag": None}
+
+
 @app.route("/members")
 def members_directory():
-    members = get_all_members()
-    return render_template("members.html", members=members)
+    global _members_page
+    # The directory only changes when a member does, so it is rendered once
+    # per change and served like the display fragments.
+    key = get_presence_version()
+    cached = _members_page
+    if cached["key"] != key:
+        members = get_all_members()
+        cached = _members_page = _cache_fragment(
+            key, render_template("members.html", members=members))
+    return _fragment_response(cached)
 
 
 @app.route("/members/<member_id>")
@@ -576,23 +904,20 @@ def leaderboard():
     return render_template("leaderboard.html", stats=stats)
 
 
-@app.route("/admin/device")
-@admin_required
+@admin_bp.route("/device")
 def admin_device():
     device_stats = get_device_stats()
     tables = get_all_tables()
     return render_template("admin_device.html", device=device_stats, tables=tables)
 
 
-@app.route("/admin/device/table/<table_name>")
-@admin_required
+@admin_bp.route("/device/table/<table_name>")
 def admin_table_view(table_name):
     data = get_table_data(table_name)
     return render_template("admin_table.html", data=data)
 
 
-@app.route("/admin/device/table/<table_name>/update", methods=["POST"])
-@admin_required
+@admin_bp.route("/device/table/<table_name>/update", methods=["POST"])
 def admin_table_update(table_name):
     pk_value = request.form.get("pk_value", "").strip()
     updates = {}
@@ -602,25 +927,40 @@ def admin_table_update(table_name):
 
     pk_column = request.form.get("pk_column", "id")
     if update_table_row(table_name, pk_column, pk_value, updates):
+        if table_name in ("members", "presence"):
+            notify_presence({"action": "edited", "table": table_name})
         flash("Row updated successfully", "success")
     else:
         flash("Failed to update row", "error")
 
-    return redirect(url_for("admin_table_view", table_name=table_name))
+    return redirect(url_for("admin.admin_table_view", table_name=table_name))
 
 
-@app.route("/api/device_stats")
+@api_bp.route("/device_stats")
 @admin_required
 def api_device_stats():
     return jsonify(get_device_stats())
 
 
-def get_device_stats() -> dict:
-    import platform
-    import subprocess
-    from app.config import DB_PATH
+# The admin dashboard polls these; reading them is slow on a Pi, and a few
+# seconds of staleness is invisible.
+DEVICE_STATS_TTL = 5
+_device_stats_cache = {"expires": 0.0, "stats": None}
 
-    stats = {
+
+def get_device_stats() -> dict:
+    now = time.monotonic()
+    if _device_stats_cache["expires"] <= now:
+        _device_stats_cache["stats"] = _read_device_stats()
+        _device_stats_cache["expires"] = now + DEVICE_STATS_TTL
+    return _device_stats_cache["stats"]
+
+
+@lru_cache(maxsize=1)
+def _platform_stats() -> dict:
+    # Fixed for the life of the process; platform.processor() even forks
+    # `uname -p` on Linux, so look these up once.
+    return {
         'platform': platform.system(),
         'platform_release': platform.release(),
         'platform_version': platform.version(),
@@ -630,6 +970,10 @@ def get_device_stats() -> dict:
         'hostname': platform.node()
     }
 
+
+def _read_device_stats() -> dict:
+    stats = dict(_platform_stats())
+
     try:
         db_size = DB_PATH.stat().st_size if DB_PATH.exists() else 0
         stats['db_size_bytes'] = db_size
@@ -639,12 +983,12 @@ def get_device_stats() -> dict:
 
     try:
         with open('/proc/meminfo', 'r') as f:
-            meminfo = f.read()
-            for line in meminfo.split('\n'):
-                if 'MemTotal' in line:
+            for line in f:
+                if line.startswith('MemTotal:'):
                     stats['mem_total'] = line.split()[1]
-                elif 'MemAvailable' in line:
+                elif line.startswith('MemAvailable:'):
                     stats['mem_available'] = line.split()[1]
+                    break
     except:
         pass
 
@@ -664,40 +1008,44 @@ def get_device_stats() -> dict:
         pass
 
     try:
-        result = subprocess.run(['df', '-h', '/'], capture_output=True, text=True, timeout=5)
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')
-            if len(lines) > 1:
-                parts = lines[1].split()
-                stats['disk_total'] = parts[1]
-                stats['disk_used'] = parts[2]
-                stats['disk_available'] = parts[3]
-                stats['disk_percent'] = parts[4]
+        # Same figures as `df /`, straight from the syscall df itself uses.
+        fs = os.statvfs('/')
+        total = fs.f_blocks * fs.f_frsize
+        used = (fs.f_blocks - fs.f_bfree) * fs.f_frsize
+        available = fs.f_bavail * fs.f_frsize
+        stats['disk_total'] = format_bytes(total)
+        stats['disk_used'] = format_bytes(used)
+        stats['disk_available'] = format_bytes(available)
+        stats['disk_percent'] = f"{-(-used * 100 // (used + available))}%"
     except:
         pass
 
     try:
-        result = subprocess.run(['hostname', '-I'], capture_output=True, text=True, timeout=5)
-        if result.returncode == 0:
-            stats['ip_addresses'] = result.stdout.strip().split()
+        stats['ip_addresses'] = _host_addresses()
     except:
         pass
 
     return stats
 
 
+BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+
 def format_bytes(size: int) -> str:
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size < 1024:
-            return f"{size:.1f} {unit}"
-        size /= 1024
-    return f"{size:.1f} TB"
+    # Each unit is 2**10 of the previous one, so the bit length picks it.
+    n = min(max(size.bit_length() - 1, 0) // 10, len(BYTE_UNITS) - 1)
+    return f"{size / (1 << (10 * n)):.1f} {BYTE_UNITS[n]}"
 
 
 def format_uptime(seconds: float) -> str:
-    days = int(seconds // 86400)
-    hours = int((seconds % 86400) // 3600)
-    minutes = int((seconds % 3600) // 60)
+    return _format_uptime_minutes(int(seconds // 60))
+
+
+@lru_cache(maxsize=128)
+def _format_uptime_minutes(total_minutes: int) -> str:
+    # Only whole minutes are shown, so each string is built once.
+    days, minutes = divmod(total_minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
     if days > 0:
         return f"{days}d {hours}h {minutes}m"
     elif hours > 0:
@@ -705,11 +1053,98 @@ def format_uptime(seconds: float) -> str:
     return f"{minutes}m"
 
 
+# The connectivity check waits on a round trip to the internet, so the
+# network page reuses its result briefly.
+NETWORK_INFO_TTL = 10
+_network_info_cache = {"expires": 0.0, "info": None}
+
+
 def get_network_info() -> dict:
-    import subprocess
-    import platform
-    import socket
+    now = time.monotonic()
+    if _network_info_cache["expires"] <= now:
+        _network_info_cache["info"] = _read_network_info()
+        _network_info_cache["expires"] = now + NETWORK_INFO_TTL
+    return _network_info_cache["info"]
+
+
+def _interface_addresses() -> dict:
+    # Interface name -> [(address, prefix length, is_global)], read with
+    # ioctls and /proc instead of forking `ip addr`. Only an interface's
+    # primary IPv4 address is visible this way.
+    import fcntl  # POSIX-only, and these helpers only run on Linux
+
+    SIOCGIFADDR = 0x8915
+    SIOCGIFNETMASK = 0x891b
+    addresses = {name: [] for _, name in socket.if_nameindex()}
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for name, addrs in addresses.items():
+            ifreq = struct.pack('256s', name[:15].encode())
+            try:
+                addr = socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFADDR, ifreq)[20:24])
+                mask = fcntl.ioctl(sock.fileno(), SIOCGIFNETMASK, ifreq)[20:24]
+            except OSError:
+                continue
+            prefix = bin(int.from_bytes(mask, 'big')).count('1')
+            addrs.append((addr, prefix, not addr.startswith('127.')))
+
+    try:
+        with open('/proc/net/if_inet6') as f:
+            for line in f:
+                addr, _, prefix, scope, _, name = line.split()
+                addresses.setdefault(name, []).append(
+                    (str(ipaddress.IPv6Address(bytes.fromhex(addr))), int(prefix, 16), scope == '00'))
+    except FileNotFoundError:
+        pass
+
+    return addresses
+
+
+def _host_addresses() -> list[str]:
+    # What `hostname -I` prints: IPv4 addresses other than loopback, then
+    # global IPv6 addresses.
+    addrs = [a for iface in _interface_addresses().values() for a in iface if a[2]]
+    return [a[0] for a in addrs if ':' not in a[0]] + [a[0] for a in addrs if ':' in a[0]]
+
+
+def _read_wireless(info: dict, iface: str = 'wlan0'):
+    # The same wireless-extension ioctls iwgetid/iwconfig use, plus the
+    # link statistics the kernel keeps in /proc/net/wireless.
+    import fcntl
+
+    SIOCGIWESSID = 0x8B1B
+    SIOCGIWRATE = 0x8B21
+    name = iface.encode()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            essid = array.array('B', bytes(33))
+            address, length = essid.buffer_info()
+            iwreq = struct.pack('16sPHH', name, address, length, 0).ljust(32, b'\0')
+            fcntl.ioctl(sock.fileno(), SIOCGIWESSID, iwreq)
+            info['ssid'] = essid.tobytes().rstrip(b'\0').decode(errors='replace') or 'Not connected'
+        except OSError:
+            pass
+
+        try:
+            iwreq = fcntl.ioctl(sock.fileno(), SIOCGIWRATE, struct.pack('16s16x', name))
+            rate = struct.unpack_from('i', iwreq, 16)[0]
+            if rate > 0:
+                info['bit_rate'] = f"{rate / 1e9:g} Gb/s" if rate >= 1e9 else f"{rate / 1e6:g} Mb/s"
+        except OSError:
+            pass
 
+    try:
+        with open('/proc/net/wireless') as f:
+            for line in f:
+                if line.strip().startswith(f'{iface}:'):
+                    fields = line.split(':', 1)[1].split()
+                    info['link_quality'] = f"{int(float(fields[1]))}/70"
+                    info['signal_level'] = f"{int(float(fields[2]))} dBm"
+                    break
+    except (OSError, IndexError, ValueError):
+        pass
+
+
+def _read_network_info() -> dict:
     info = {'hostname': platform.node(), 'interfaces': []}
 
     try:
@@ -719,45 +1154,8 @@ def get_network_info() -> dict:
 
     is_linux = platform.system() == 'Linux'
 
-    # WiFi SSID
-    try:
-        if is_linux:
-            result = subprocess.run(['iwgetid', '-r'], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                info['ssid'] = result.stdout.strip() or 'Not connected'
-        else:
-            result = subprocess.run(
-                ['/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport', '-I'],
-                capture_output=True, text=True, timeout=5
-            )
-            if result.returncode == 0:
-                for line in result.stdout.split('\n'):
-                    if ' SSID:' in line:
-                        info['ssid'] = line.split(':', 1)[1].strip()
-    except:
-        info['ssid'] = 'Unknown'
-
-    # Signal strength and link quality (Linux/Pi)
     if is_linux:
-        try:
-            result = subprocess.run(['iwconfig', 'wlan0'], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                output = result.stdout
-                for line in output.split('\n'):
-                    if 'Bit Rate' in line:
-                        for part in line.split('  '):
-                            part = part.strip()
-                            if part.startswith('Bit Rate'):
-                                info['bit_rate'] = part.split('=')[1] if '=' in part else part.split(':')[1]
-                    if 'Link Quality' in line:
-                        for part in line.split('  '):
-                            part = part.strip()
-                            if part.startswith('Link Quality'):
-                                info['link_quality'] = part.split('=')[1].split(' ')[0]
-                            if part.startswith('Signal level'):
-                                info['signal_level'] = part.split('=')[1]
-        except:
-            pass
+        _read_wireless(info)
 
         # Traffic stats
         try:
@@ -768,24 +1166,41 @@ def get_network_info() -> dict:
         except:
             pass
 
-    # IP addresses per interface
-    try:
-        if is_linux:
-            result = subprocess.run(['ip', '-brief', 'addr'], capture_output=True, text=True, timeout=5)
-        else:
-            result = subprocess.run(['ifconfig'], capture_output=True, text=True, timeout=5)
+        # IP addresses per interface, like `ip -brief addr`
+        try:
+            for name, addrs in _interface_addresses().items():
+                if not addrs:
+                    continue
+                try:
+                    with open(f'/sys/class/net/{name}/operstate') as f:
+                        state = f.read().strip().upper()
+                except OSError:
+                    state = 'UNKNOWN'
+                info['interfaces'].append({
+                    'name': name,
+                    'state': state,
+                    'addresses': [f"{addr}/{prefix}" for addr, prefix, _ in addrs]
+                })
+        except:
+            pass
+    else:
+        # WiFi SSID
+        try:
+            result = subprocess.run(
+                ['/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport', '-I'],
+                capture_output=True, text=True, timeout=5
+            )
+            if result.returncode == 0:
+                for line in result.stdout.split('\n'):
+                    if ' SSID:' in line:
+                        info['ssid'] = line.split(':', 1)[1].strip()
+        except:
+            info['ssid'] = 'Unknown'
 
-        if result.returncode == 0:
-            if is_linux:
-                for line in result.stdout.strip().split('\n'):
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        info['interfaces'].append({
-                            'name': parts[0],
-                            'state': parts[1],
-                            'addresses': parts[2:]
-                        })
-            else:
+        # IP addresses per interface
+        try:
+            result = subprocess.run(['ifconfig'], capture_output=True, text=True, timeout=5)
+            if result.returncode == 0:
                 current_iface = None
                 for line in result.stdout.split('\n'):
                     if line and not line.startswith('\t') and not line.startswith(' '):
@@ -797,41 +1212,89 @@ def get_network_info() -> dict:
                             'state': 'UP',
                             'addresses': [addr]
                         })
-    except:
-        pass
+        except:
+            pass
 
-    # Internet connectivity check
+    # Internet connectivity: time a TCP handshake with a public DNS server
+    # rather than forking ping.
     try:
-        result = subprocess.run(['ping', '-c', '1', '-W', '2', '8.8.8.8'], capture_output=True, text=True, timeout=5)
-        info['internet'] = 'Connected' if result.returncode == 0 else 'No connection'
-        if result.returncode == 0:
-            for line in result.stdout.split('\n'):
-                if 'time=' in line:
-                    time_part = line.split('time=')[1].split()[0]
-                    info['ping_ms'] = time_part
-    except:
-        info['internet'] = 'Unknown'
+        start = time.perf_counter()
+        with socket.create_connection(('8.8.8.8', 53), timeout=2):
+            info['ping_ms'] = f"{(time.perf_counter() - start) * 1000:.1f}"
+        info['internet'] = 'Connected'
+    except OSError:
+        info['internet'] = 'No connection'
 
     return info
 
 
-@app.route("/admin/device/network")
-@admin_required
+@admin_bp.route("/device/network")
 def admin_network():
     net_info = get_network_info()
     return render_template("admin_network.html", net=net_info)
 
 
+# Last rendered fragments, rebuilt only when their inputs change.
+_present_fragment = {"key": None, "html": None, "gzip": None, "etag": None}
+_scan_status_fragment = {"key": None, "html": None, "gzip": None, "etag": None}
+
+
+# Fragments smaller than this are sent as-is; gzip would barely help.
+GZIP_MIN_SIZE = 256
+
+
+def _fragment_response(cached: dict):
+    if cached["gzip"] is not None and request.accept_encodings["gzip"]:
+        response = make_response(cached["gzip"])
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(cached["etag"] + "-gz")
+    else:
+        response = make_response(cached["html"])
+        response.set_etag(cached["etag"])
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response.make_conditional(request)
+
+
+def _cache_fragment(key, html: str) -> dict:
+    # Compressed once when the fragment changes, not on every poll.
+    body = html.encode()
+    compressed = gzip.compress(body, 6, mtime=0) if len(body) >= GZIP_MIN_SIZE else None
+    return {"key": key, "html": html, "gzip": compressed,
+            "etag": md5(body).hexdigest()}
+
+
+def _current_present_fragment() -> dict:
+    global _present_fragment
+    # Durations are shown in whole minutes, so the minute is part of the key.
+    key = (get_presence_version(), int(time.time()) // 60)
+    cached = _present_fragment
+    if cached["key"] != key:
+        present = get_present_members()
+        cached = _present_fragment = _cache_fragment(
+            key, render_template("_present_list.html", present=present))
+    return cached
+
+
 @app.route("/fragment/present-list")
 def fragment_present_list():
-    present = get_present_members()
-    return render_template("_present_list.html", present=present)
+    return _fragment_response(_current_present_fragment())
 
 
 @app.route("/fragment/scan-status")
 def fragment_scan_status():
-    last_scan = get_last_scan_info()
-    return render_template("_scan_status.html", last_scan=last_scan)
+    global _scan_status_fragment
+    # Each scan publishes a new dict, so identity is enough to spot changes.
+    last_scan = cached_last_scan()
+    cached = _scan_status_fragment
+    if cached["key"] is not last_scan:
+        cached = _scan_status_fragment = _cache_fragment(
+            last_scan, render_template("_scan_status.html", last_scan=last_scan))
+    return _fragment_response(cached)
+
+
+app.register_blueprint(admin_bp)
+app.register_blueprint(api_bp)
 
 
 def create_app(use_rfid: bool = True):
@@ -840,6 +1303,11 @@ def create_app(use_rfid: bool = True):
     if stale:
         print(f"Auto-checked out {stale} stale members from previous session")
     set_presence_callback(notify_clients)
+    # Build the URL matcher and compile every template now rather than on
+    # the first request that needs them.
+    app.url_map.update()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
     start_scanner(use_rfid=use_rfid)
     return app
 
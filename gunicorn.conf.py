@@ -0,0 +1,31 @@
+# Production server settings: gunicorn -c gunicorn.conf.py
+#
+# The RFID scanner thread, the SSE client list and the in-memory caches all
+# live in the app process, so there must be exactly one worker. Concurrency
+# comes from threads instead: each open /events stream holds one, and the
+# rest serve page loads and polls.
+
+import threading
+
+from app.config import WEB_HOST, WEB_PORT
+
+# 32 threads at the default 8 MB stack reserve a lot of address space on a
+# Pi Zero; request handlers never recurse deeply. Set here, in the master,
+# so the forked worker inherits it.
+threading.stack_size(512 * 1024)
+
+wsgi_app = "app.web:create_app()"
+bind = f"{WEB_HOST}:{WEB_PORT}"
+
+workers = 1
+worker_class = "gthread"
+threads = 32
+
+# SSE streams are long-lived by design; the worker still heartbeats while
+# threads are blocked on them.
+timeout = 60
+keepalive = 5
+# Bound the accept queue so a burst waits briefly or is refused rather than
+# piling up behind the threads.
+backlog = 64
+graceful_timeout = 10
@@ -5,13 +5,17 @@ Main entry point - starts RFID scanner and web server.
 """
 
 import argparse
+import runpy
 import signal
 import sys
+from pathlib import Path
 
 from app.web import create_app
 from app.rfid_scanner import stop_scanner
 from app.config import WEB_HOST, WEB_PORT
 
+GUNICORN_CONF = Path(__file__).resolve().parent / "gunicorn.conf.py"
+
 
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully."""
@@ -20,6 +24,25 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 
+def serve_gunicorn(port: int, use_rfid: bool):
+    """Run under Gunicorn with the settings from gunicorn.conf.py."""
+    from gunicorn.app.base import BaseApplication
+
+    class ErgRoomApplication(BaseApplication):
+        def load_config(self):
+            settings = runpy.run_path(str(GUNICORN_CONF))
+            for key, value in settings.items():
+                if key in self.cfg.settings and key != "wsgi_app":
+                    self.cfg.set(key, value)
+            self.cfg.set("bind", f"{WEB_HOST}:{port}")
+
+        def load(self):
+            # Called in the worker, so the scanner thread starts after the fork.
+            return create_app(use_rfid=use_rfid)
+
+    ErgRoomApplication().run()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Who's In the Erg Room? (RFID)")
     parser.add_argument(
@@ -40,14 +63,7 @@ def main():
     )
     
     args = parser.parse_args()
-    
-    # Register signal handler
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
-    # Create and run app
     use_rfid = not args.no_rfid
-    app = create_app(use_rfid=use_rfid)
     
     print(f"""
 ╔═══════════════════════════════════════════╗
@@ -60,10 +76,20 @@ def main():
 ╚═══════════════════════════════════════════╝
     """)
     
+    if not args.debug:
+        serve_gunicorn(args.port, use_rfid)
+        return
+    
+    # Register signal handler
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    
+    # The Werkzeug server is only for debugging (reloader, tracebacks)
+    app = create_app(use_rfid=use_rfid)
     app.run(
         host=WEB_HOST, 
         port=args.port, 
-        debug=args.debug,
+        debug=True,
         threaded=True
     )
 
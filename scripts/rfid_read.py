@@ -1,51 +1,87 @@
 #!/usr/bin/env python3
 """Read any RFID/NFC tag and dump all available data."""
+import os
+import time
+
 import RPi.GPIO as GPIO
 from mfrc522 import MFRC522
 
+POLL_INTERVAL = 0.1
+# A tag resting on the reader is seen on every poll; dump it once per tap.
+DEBOUNCE = int(os.environ.get("RFID_DEBOUNCE_MS", 3000)) / 1000
+# Byte -> itself if printable ASCII, else '.', for the dump's text column.
+PRINTABLE = bytes(c if 32 <= c < 127 else 46 for c in range(256))
+
 reader = MFRC522()
 print("Tap any tag (Ctrl+C to quit)...")
 
+# Default key for many cards including university IDs
+keys = [
+    [0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF],
+    [0xA0, 0xA1, 0xA2, 0xA3, 0xA4, 0xA5],
+    [0xD3, 0xF7, 0xD3, 0xF7, 0xD3, 0xF7],
+]
+
+last_uid = None
+last_seen = 0.0
+
 try:
     while True:
         status, tag_type = reader.MFRC522_Request(reader.PICC_REQIDL)
         if status != reader.MI_OK:
+            time.sleep(POLL_INTERVAL)
             continue
 
         status, uid = reader.MFRC522_Anticoll()
         if status != reader.MI_OK:
             continue
 
-        uid_hex = ''.join(format(b, '02X') for b in uid)
-        uid_dec = int(uid_hex, 16)
-        print(f"\n--- Tag Detected ---")
-        print(f"UID (hex):  {uid_hex}")
-        print(f"UID (dec):  {uid_dec}")
-        print(f"Tag type:   0x{tag_type:02X}")
-
-        reader.MFRC522_SelectTag(uid)
+        # Still the same tap while the tag keeps answering within the window.
+        now = time.monotonic()
+        is_repeat = uid == last_uid and now - last_seen < DEBOUNCE
+        last_uid, last_seen = uid, now
+        if is_repeat:
+            time.sleep(POLL_INTERVAL)
+            continue
 
-        # Try to read all 64 sectors (MIFARE 1K = 16 sectors x 4 blocks)
-        # Default key for many cards including university IDs
-        keys = [
-            [0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF],
-            [0xA0, 0xA1, 0xA2, 0xA3, 0xA4, 0xA5],
-            [0xD3, 0xF7, 0xD3, 0xF7, 0xD3, 0xF7],
+        uid_hex = bytes(uid).hex().upper()
+        uid_dec = int.from_bytes(bytes(uid), 'big')
+        # The whole dump is written in one go once the card has been read.
+        lines = [
+            "\n--- Tag Detected ---",
+            f"UID (hex):  {uid_hex}",
+            f"UID (dec):  {uid_dec}",
+            f"Tag type:   0x{tag_type:02X}",
         ]
 
-        for block in range(64):
+        reader.MFRC522_SelectTag(uid)
+
+        # Read all 64 blocks (MIFARE 1K = 16 sectors x 4 blocks). One
+        # successful auth covers a whole sector, so keys are only tried once
+        # per sector, and a key that works moves to the front for the next.
+        for sector in range(16):
+            first = sector * 4
             for key in keys:
-                status = reader.MFRC522_Auth(reader.PICC_AUTHENT1A, block, key, uid)
+                status = reader.MFRC522_Auth(reader.PICC_AUTHENT1A, first + 3, key, uid)
                 if status == reader.MI_OK:
-                    data = reader.MFRC522_Read(block)
-                    if data:
-                        raw = ' '.join(format(b, '02X') for b in data)
-                        ascii_str = ''.join(chr(b) if 32 <= b < 127 else '.' for b in data)
-                        print(f"Block {block:02d}: {raw}  |{ascii_str}|")
+                    if key is not keys[0]:
+                        keys.remove(key)
+                        keys.insert(0, key)
                     break
+            else:
+                continue
+
+            for block in range(first, first + 4):
+                data = reader.MFRC522_Read(block)
+                if data:
+                    block_bytes = bytes(data)
+                    raw = block_bytes.hex(' ').upper()
+                    ascii_str = block_bytes.translate(PRINTABLE).decode('ascii')
+                    lines.append(f"Block {block:02d}: {raw}  |{ascii_str}|")
 
         reader.MFRC522_StopCrypto1()
-        print("--- End ---\n")
+        lines.append("--- End ---\n")
+        print("\n".join(lines), flush=True)
 
 except KeyboardInterrupt:
     print("\nDone")
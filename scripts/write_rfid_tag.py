@@ -4,7 +4,9 @@ Write member IDs to RFID tags.
 Run this script and tap a blank tag to write a member ID to it.
 """
 
+import json
 import sys
+import time
 from pathlib import Path
 
 # Add parent directory to path for imports
@@ -19,6 +21,30 @@ TEAM_MEMBERS = [
     {"id": "test005", "name": "Eve (HW)"},
 ]
 
+# Lookup table for resolving tag contents to a member name
+TEAM_MEMBERS_BY_ID = {m["id"]: m["name"] for m in TEAM_MEMBERS}
+
+# IDs already written by bulk mode, so an interrupted run picks up where it
+# left off. Kept in data/ with the other runtime state, which is neither
+# committed nor synced.
+WRITTEN_FILE = Path(__file__).parent.parent / "data" / "written.json"
+
+
+POLL_INTERVAL = 0.1
+
+
+def wait_for_tag(operation, *args):
+    """Retry a non-blocking reader call until a tag answers.
+
+    SimpleMFRC522's read() and write() retry in a tight loop; pausing
+    between attempts keeps the Pi idle while waiting for a tap.
+    """
+    while True:
+        id, text = operation(*args)
+        if id:
+            return id, text
+        time.sleep(POLL_INTERVAL)
+
 
 def list_members():
     """Display all team members and their IDs."""
@@ -48,6 +74,7 @@ def write_tag_interactive():
             print("  2. Read a tag")
             print("  3. List members")
             print("  4. Write custom ID")
+            print("  5. Bulk-write remaining members")
             print("  q. Quit")
             
             choice = input("\nChoice: ").strip().lower()
@@ -62,6 +89,8 @@ def write_tag_interactive():
                 list_members()
             elif choice == '4':
                 write_custom_tag(reader)
+            elif choice == '5':
+                bulk_write_tags(reader)
             else:
                 print("Invalid choice")
         
@@ -92,7 +121,7 @@ def write_member_tag(reader):
             print("Place the RFID tag on the reader...")
             
             # Write the member ID as text data
-            reader.write(member_id)
+            wait_for_tag(reader.write_no_block, member_id)
             
             print(f"✓ Successfully wrote '{member_id}' to tag!")
             print(f"  This tag is now assigned to: {member_name}")
@@ -105,6 +134,45 @@ def write_member_tag(reader):
         print(f"Write failed: {e}")
 
 
+def wait_for_new_tag(reader, last_uid):
+    """Wait for a tag other than the one just written."""
+    while True:
+        uid, _ = wait_for_tag(reader.read_no_block)
+        if uid != last_uid:
+            return
+        time.sleep(POLL_INTERVAL)
+
+
+def bulk_write_tags(reader):
+    """Write every member not yet written, one tap each, with no prompts."""
+    try:
+        written = set(json.loads(WRITTEN_FILE.read_text()))
+    except FileNotFoundError:
+        written = set()
+    except (ValueError, TypeError):
+        print(f"Ignoring unreadable {WRITTEN_FILE}; starting from scratch")
+        written = set()
+
+    remaining = [m for m in TEAM_MEMBERS if m['id'] not in written]
+    if not remaining:
+        print(f"All members written (delete {WRITTEN_FILE} to start over)")
+        return
+
+    WRITTEN_FILE.parent.mkdir(exist_ok=True)
+    last_uid = None
+    try:
+        for i, member in enumerate(remaining, 1):
+            print(f"\n[{i}/{len(remaining)}] Place a tag for {member['name']} (Ctrl+C to stop)...")
+            wait_for_new_tag(reader, last_uid)
+            last_uid, _ = wait_for_tag(reader.write_no_block, member['id'])
+            print(f"✓ Wrote '{member['id']}'")
+
+            written.add(member['id'])
+            WRITTEN_FILE.write_text(json.dumps(sorted(written)))
+    except KeyboardInterrupt:
+        print("\nBulk write stopped")
+
+
 def write_custom_tag(reader):
     """Write a custom ID to a tag."""
     custom_id = input("Enter custom ID to write: ").strip()
@@ -117,7 +185,7 @@ def write_custom_tag(reader):
     print("Place the RFID tag on the reader...")
     
     try:
-        reader.write(custom_id)
+        wait_for_tag(reader.write_no_block, custom_id)
         print(f"✓ Successfully wrote '{custom_id}' to tag!")
     except Exception as e:
         print(f"Write failed: {e}")
@@ -128,7 +196,7 @@ def read_tag(reader):
     print("\nPlace the RFID tag on the reader...")
     
     try:
-        id, text = reader.read()
+        id, text = wait_for_tag(reader.read_no_block)
         
         tag_id_hex = format(id, 'x')
         text = text.strip() if text else ""
@@ -139,19 +207,13 @@ def read_tag(reader):
         print(f"  Stored text:   '{text}'")
         
         # Check if this matches a team member
-        # First check by stored text (member_id)
-        for member in TEAM_MEMBERS:
-            if member['id'] == text:
-                print(f"  Assigned to:   {member['name']}")
-                break
+        # First check by stored text (member_id), then by hex UID
+        if text in TEAM_MEMBERS_BY_ID:
+            print(f"  Assigned to:   {TEAM_MEMBERS_BY_ID[text]}")
+        elif tag_id_hex in TEAM_MEMBERS_BY_ID:
+            print(f"  Assigned to:   {TEAM_MEMBERS_BY_ID[tag_id_hex]} (by UID)")
         else:
-            # Check by hex UID
-            for member in TEAM_MEMBERS:
-                if member['id'] == tag_id_hex:
-                    print(f"  Assigned to:   {member['name']} (by UID)")
-                    break
-            else:
-                print("  Assigned to:   (not registered)")
+            print("  Assigned to:   (not registered)")
         
     except Exception as e:
         print(f"Read failed: {e}")
@@ -166,11 +228,7 @@ def quick_write(member_id: str):
         reader = SimpleMFRC522()
         
         # Find member name if it exists
-        member_name = None
-        for member in TEAM_MEMBERS:
-            if member['id'] == member_id:
-                member_name = member['name']
-                break
+        member_name = TEAM_MEMBERS_BY_ID.get(member_id)
         
         if member_name:
             print(f"Ready to write ID '{member_id}' for {member_name}")
@@ -179,7 +237,7 @@ def quick_write(member_id: str):
         
         print("Place the RFID tag on the reader...")
         
-        reader.write(member_id)
+        wait_for_tag(reader.write_no_block, member_id)
         
         print(f"✓ Successfully wrote '{member_id}' to tag!")
         
@@ -190,8 +248,45 @@ def quick_write(member_id: str):
         sys.exit(1)
 
 
+def write_from_stdin():
+    """Daemon mode - write each ID read from stdin to the next tag tapped.
+
+    One reader is set up for the whole run, so a script can feed IDs in
+    without paying for SPI and MFRC522 initialisation on every tag.
+    """
+    try:
+        from mfrc522 import SimpleMFRC522
+        import RPi.GPIO as GPIO
+    except ImportError:
+        print("ERROR: mfrc522 library not installed.")
+        sys.exit(1)
+
+    reader = SimpleMFRC522()
+    last_uid = None
+
+    try:
+        for line in sys.stdin:
+            member_id = line.strip()
+            if not member_id:
+                continue
+
+            print(f"Place a tag for '{member_id}'...", flush=True)
+
+            # Don't overwrite the tag that was just written if it's still
+            # sitting on the reader.
+            wait_for_new_tag(reader, last_uid)
+
+            last_uid, _ = wait_for_tag(reader.write_no_block, member_id)
+            print(f"✓ Wrote '{member_id}' to tag {last_uid:x}", flush=True)
+    finally:
+        GPIO.cleanup()
+
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if sys.argv[1:] == ["--daemon"]:
+        # Daemon mode: some_command | python write_rfid_tag.py --daemon
+        write_from_stdin()
+    elif len(sys.argv) > 1:
         # Quick write mode: python write_rfid_tag.py <member_id>
         quick_write(sys.argv[1])
     else: